@@ -0,0 +1,258 @@
+import os
+import queue
+import functools
+import shutil
+import logging
+import threading
+from collections import deque
+from time import monotonic
+
+from typing import Any, Callable
+
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactStore:
+    """
+    Write-behind store for session artifacts.
+
+    Recordings and photos are written to a RAM-backed staging directory
+    first. A flusher thread copies committed files to their target directory
+    in batches, with a single sync per batch, and removes the staged copies.
+
+    If `max_staged_bytes` is set, artifacts which would grow the staging
+    directory beyond it are written directly to their target path.
+
+    Files left in the staging directory by a crash are flushed when the
+    store is started again.
+    """
+    def __init__(self, staging: str, target: str, batch_size: int = 8,
+                 batch_wait: float = 0.5, max_staged_bytes: int = None,
+                 on_recovered: Callable = None):
+        """
+        :param staging: The staging directory, should be on a tmpfs
+        :param target: The directory the artifacts belong to
+        :param batch_size: Maximum number of files per batch
+        :param batch_wait: Seconds to wait for more files to fill a batch
+        :param max_staged_bytes: Maximum size of the staged artifacts,
+                                 `None` for no limit
+        :param on_recovered: Called with the target path of every artifact
+                             recovered from a previous run, once it is
+                             flushed
+        """
+        self.staging = staging
+        self.target = target
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_staged_bytes = max_staged_bytes
+        self.enabled = True
+        try:
+            os.makedirs(self.staging, exist_ok=True)
+        except OSError:
+            logger.exception(f'cannot stage files in {self.staging}')
+            self.enabled = False
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        # Bytes of committed artifacts and size estimates of staged ones
+        # which are not committed yet
+        self.staged_bytes = 0
+        self._reserved = {}
+        self.unstaged = 0
+        self.flushed = 0
+        self.flushed_bytes = 0
+        self.latencies = deque(maxlen=100)
+        # Queued before the session stages anything, so leftovers are
+        # never confused with new artifacts
+        self._recover(on_recovered)
+        self._thread = threading.Thread(target=self._run,
+                                        name='artifact-flusher', daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self):
+        """
+        :return: the number of committed files waiting to be flushed
+        """
+        return self._queue.qsize()
+
+    def _staged(self, path: str):
+        """
+        :return: the staging path for `path`, or `None` if it is not staged
+        """
+        rel = os.path.relpath(os.path.abspath(path),
+                              os.path.abspath(self.target))
+        if not self.enabled or rel.startswith(os.pardir):
+            return None
+        return os.path.join(self.staging, rel)
+
+    def stage(self, filename: Any, size: int = 0):
+        """
+        Get the path to write an artifact to
+
+        :param filename: The target path of the artifact
+        :param size: The expected size of the artifact in bytes
+        :return: the path in the staging directory, or the target path if
+                 the artifact can not be staged
+        """
+        path = str(filename)
+        staged = self._staged(path)
+        if staged is None:
+            return path
+        with self._lock:
+            if self.max_staged_bytes is not None and \
+                    self.staged_bytes + size > self.max_staged_bytes:
+                self.unstaged += 1
+                logger.info(f'staging is full, writing {path} directly')
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                return path
+            self.staged_bytes += size - self._reserved.pop(path, 0)
+            self._reserved[path] = size
+        os.makedirs(os.path.dirname(staged), exist_ok=True)
+        return staged
+
+    def commit(self, filename: Any, on_flushed: Callable = None):
+        """
+        Queue a staged artifact to be flushed to its target path
+
+        :param filename: The target path of the artifact
+        :param on_flushed: Called without arguments once the artifact is
+                           stored at its target path
+        """
+        path = str(filename)
+        staged = self._staged(path)
+        try:
+            size = os.path.getsize(staged) if staged is not None else None
+        except OSError:
+            # Written directly to the target
+            size = None
+        with self._lock:
+            self.staged_bytes -= self._reserved.pop(path, 0)
+            if size is not None:
+                self.staged_bytes += size
+        if size is None:
+            if on_flushed is not None:
+                on_flushed()
+            return
+        self._queue.put((path, on_flushed, monotonic(), size))
+
+    def discard(self, filename: Any):
+        """
+        Remove a staged artifact which is not going to be committed
+
+        :param filename: The target path of the artifact
+        """
+        path = str(filename)
+        staged = self._staged(path)
+        with self._lock:
+            self.staged_bytes -= self._reserved.pop(path, 0)
+        if staged is not None:
+            try:
+                os.remove(staged)
+            except OSError:
+                pass
+
+    def flush(self, timeout: float = None):
+        """
+        Wait until all committed artifacts are flushed
+
+        :param timeout: float
+                    Default `None`, maximum time in seconds to wait
+        :return: `True` if all artifacts are flushed
+        """
+        done = threading.Event()
+        self._queue.put((None, done.set, monotonic(), 0))
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get(timeout=self.batch_wait))
+            except queue.Empty:
+                pass
+            self._flush(batch)
+
+    def _recover(self, on_recovered: Callable = None):
+        """
+        Queue the files left in the staging directory by a previous run
+        """
+        if not self.enabled:
+            return
+        paths = []
+        for root, _, files in os.walk(self.staging):
+            for name in files:
+                rel = os.path.relpath(os.path.join(root, name), self.staging)
+                paths.append(os.path.join(self.target, rel))
+        if not paths:
+            return
+        logger.warning(f'recovering {len(paths)} unflushed artifacts')
+        # Reversed, so continuations like `.tail` parts are flushed before
+        # the file they continue
+        for path in sorted(paths, reverse=True):
+            on_flushed = None
+            if on_recovered is not None:
+                on_flushed = functools.partial(on_recovered, path)
+            self.commit(path, on_flushed)
+
+    def _flush(self, batch):
+        copied = []
+        for path, on_flushed, committed, size in batch:
+            if path is None:
+                continue
+            staged = self._staged(path)
+            try:
+                stat = os.stat(staged)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = path + '.part'
+                shutil.copyfile(staged, tmp)
+                os.replace(tmp, path)
+                copied.append((staged, stat))
+                self.flushed_bytes += stat.st_size
+            except OSError:
+                logger.exception(f'could not flush {path}')
+        # One sync for the whole batch
+        os.sync()
+        now = monotonic()
+        for staged, stat in copied:
+            try:
+                # Keep the staged file if it was rewritten in the meantime,
+                # it will be committed again
+                current = os.stat(staged)
+                if (current.st_mtime_ns, current.st_size) == \
+                        (stat.st_mtime_ns, stat.st_size):
+                    os.remove(staged)
+            except OSError:
+                pass
+        with self._lock:
+            self.staged_bytes -= sum(item[3] for item in batch)
+        for path, on_flushed, committed, size in batch:
+            if path is not None:
+                self.flushed += 1
+                self.latencies.append(now - committed)
+            if on_flushed is not None:
+                try:
+                    on_flushed()
+                except Exception:
+                    logger.exception(f'callback for {path} failed')
+        logger.debug(f'flushed {len(copied)} artifacts, '
+                     f'{self.depth} waiting')
+
+    def stats(self):
+        """
+        :return: a dict with the queue depth, the staged bytes, the files
+                 written directly to the target, flushed files and bytes
+                 and the latency from commit to flushed in seconds
+        """
+        latencies = list(self.latencies)
+        return {
+            'depth': self.depth,
+            'staged_bytes': self.staged_bytes,
+            'unstaged': self.unstaged,
+            'flushed': self.flushed,
+            'flushed_bytes': self.flushed_bytes,
+            'mean_latency': (sum(latencies) / len(latencies)
+                             if latencies else None),
+            'max_latency': max(latencies) if latencies else None
+        }
@@ -0,0 +1,537 @@
+import os
+import logging
+import queue
+import threading
+from collections import deque
+from time import sleep, monotonic
+
+from typing import Any
+
+import numpy as np
+import sounddevice as sd
+import soundfile as sf
+
+
+logger = logging.getLogger(__name__)
+
+
+def resample(data: Any, fs_in: int, fs_out: int):
+    """
+    Resample audio data by linear interpolation along the time axis
+
+    :param data: The sample data, one column per channel
+    :param fs_in: The samplerate of `data`
+    :param fs_out: The target samplerate
+    :return: the resampled data
+    """
+    if fs_in == fs_out or len(data) == 0:
+        return data
+    n_out = int(round(len(data) * fs_out / fs_in))
+    x_old = np.arange(len(data))
+    x_new = np.arange(n_out) * (fs_in / fs_out)
+    if data.ndim == 1:
+        return np.interp(x_new, x_old, data).astype(data.dtype)
+    out = np.empty((n_out, data.shape[1]), dtype=data.dtype)
+    for channel in range(data.shape[1]):
+        out[:, channel] = np.interp(x_new, x_old, data[:, channel])
+    return out
+
+
+def recording_format(path: str, format: str = None, subtype: str = None,
+                     default_subtype: str = 'FLOAT'):
+    """
+    Choose file format and sample format of a recording
+
+    :param path: The path of the file
+    :param format: The file format, default is to derive it from the
+                   extension of `path`
+    :param subtype: The sample format, default is `default_subtype` if the
+                    file format supports it, else the format's default
+    :param default_subtype: The preferred sample format
+    :return: a tuple of the file format and the sample format
+    """
+    if format is None:
+        format = os.path.splitext(path)[1][1:]
+    format = format.upper()
+    if subtype is None:
+        subtype = default_subtype \
+            if sf.check_format(format, default_subtype) \
+            else sf.default_subtype(format)
+    return format, subtype
+
+
+class Clip:
+    """
+    A sound queued for playback on an `AudioEngine`
+    """
+    def __init__(self, data: Any, lookahead: int):
+        self.data = data
+        self.pos = 0
+        self.lookahead = lookahead
+        self.cancelled = False
+        self.submitted = monotonic()
+        # Set when only `lookahead` frames are left to be played, so the next
+        # clip can be queued without a gap
+        self.queued = threading.Event()
+        # Set when all frames have been handed to the device
+        self.done = threading.Event()
+
+    @property
+    def remaining(self):
+        return len(self.data) - self.pos
+
+    def finish(self):
+        self.queued.set()
+        self.done.set()
+
+
+class AudioEngine:
+    """
+    Plays sounds through a single output stream, which stays open for the
+    whole session. Clips are queued and copied into the stream's callback one
+    after another, so consecutive sounds play without gaps.
+
+    The gaps of silence between consecutive clips and output underruns are
+    counted.
+    """
+    def __init__(self, samplerate: int = 44100, channels: int = 2,
+                 blocksize: int = 1024, latency: Any = 'low',
+                 lookahead_blocks: int = 2):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.latency = latency
+        self.lookahead = lookahead_blocks * blocksize
+        self._stream = None
+        self._queue = queue.Queue()
+        self._current = None
+        self._last = None
+        self._lock = threading.Lock()
+        # Silent frames since the last clip ended, `None` before the first
+        self._silent_frames = None
+        # When the last clip ended
+        self._finished_at = None
+        self.clips = 0
+        self.underruns = 0
+        self.gaps = deque(maxlen=100)
+
+    @property
+    def running(self):
+        return self._stream is not None and self._stream.active
+
+    def start(self):
+        """
+        Open and start the output stream, if it is not running yet
+        """
+        with self._lock:
+            if self._stream is not None:
+                return
+            self._stream = sd.OutputStream(samplerate=self.samplerate,
+                                           blocksize=self.blocksize,
+                                           channels=self.channels,
+                                           dtype='float32',
+                                           latency=self.latency,
+                                           callback=self._callback)
+            self._stream.start()
+        logger.info(f'audio engine started ({self.samplerate}Hz, '
+                    f'blocksize={self.blocksize}, '
+                    f'latency={self._stream.latency * 1000:.1f}ms)')
+
+    def drain(self, timeout: float = None):
+        """
+        Wait until all queued clips have been played
+
+        :param timeout: float
+                    Default `None`, maximum time in seconds to wait
+        :return: `True` if all clips have been played
+        """
+        last = self._last
+        if last is None or not self.running:
+            return True
+        if not last.done.wait(timeout):
+            return False
+        # Let the device play out its buffer
+        sleep(self._stream.latency)
+        return True
+
+    def stop(self, drain: bool = False):
+        """
+        Close the output stream and drop all queued clips
+
+        :param drain: `True` to play all queued clips before closing
+        """
+        if drain:
+            self.drain()
+        with self._lock:
+            if self._stream is None:
+                return
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+        self.cancel()
+        if self._current is not None:
+            self._current.finish()
+            self._current = None
+
+    def play(self, data: Any, fs: int):
+        """
+        Queue a sound for playback
+
+        :param data: The sample data
+        :param fs: The samplerate of `data`. Sounds which do not match the
+                   engine's samplerate are resampled, which should rather
+                   happen at load time.
+        :return: the queued `Clip`
+        """
+        if fs != self.samplerate:
+            logger.warning(f'resampling {fs}Hz to {self.samplerate}Hz '
+                           f'during playback')
+            data = resample(data, fs, self.samplerate)
+        if data.ndim == 1:
+            data = data.reshape(-1, 1)
+        clip = Clip(data, self.lookahead)
+        self.start()
+        self._last = clip
+        self._queue.put(clip)
+        return clip
+
+    def cancel(self):
+        """
+        Stop all queued and playing clips
+        """
+        current = self._current
+        if current is not None:
+            current.cancelled = True
+        while True:
+            try:
+                self._queue.get_nowait().finish()
+            except queue.Empty:
+                break
+
+    def _callback(self, outdata, frames, time, status):
+        if status.output_underflow:
+            self.underruns += 1
+        filled = 0
+        while filled < frames:
+            clip = self._current
+            if clip is None or clip.cancelled:
+                if clip is not None:
+                    clip.finish()
+                    self._finished_at = monotonic()
+                try:
+                    clip = self._current = self._queue.get_nowait()
+                except queue.Empty:
+                    self._current = None
+                    break
+                self.clips += 1
+                # Only silence between back to back clips is a gap, not a
+                # pause in which nothing was queued
+                if self._silent_frames is not None and \
+                        self._finished_at is not None and \
+                        clip.submitted <= self._finished_at:
+                    self.gaps.append(self._silent_frames / self.samplerate)
+                self._silent_frames = 0
+            n = min(frames - filled, clip.remaining)
+            outdata[filled:filled + n] = clip.data[clip.pos:clip.pos + n,
+                                                   :self.channels]
+            clip.pos += n
+            filled += n
+            if clip.remaining <= clip.lookahead:
+                clip.queued.set()
+            if clip.remaining == 0:
+                clip.finish()
+                self._finished_at = monotonic()
+                self._current = None
+        if filled < frames:
+            outdata[filled:] = 0
+            if self._silent_frames is not None:
+                self._silent_frames += frames - filled
+
+    def stats(self):
+        """
+        :return: a dict with the number of clips, underruns and the gaps
+                 between consecutive clips in seconds
+        """
+        gaps = list(self.gaps)
+        return {
+            'clips': self.clips,
+            'underruns': self.underruns,
+            'last_gap': gaps[-1] if gaps else None,
+            'mean_gap': sum(gaps) / len(gaps) if gaps else None,
+            'max_gap': max(gaps) if gaps else None
+        }
+
+
+class InputRing:
+    """
+    Keeps the microphone open and the last `seconds` of input in a ring
+    buffer. A `Recorder` attached to the ring starts with the buffered
+    pre-roll and then receives the live input, without opening a device.
+    """
+    def __init__(self, samplerate: int = 44100, channels: int = 2,
+                 seconds: float = 1.0, blocksize: int = 1024):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self._buffer = np.zeros((int(seconds * samplerate), channels),
+                                dtype='float32')
+        self._pos = 0
+        self._filled = 0
+        self._sink = None
+        self._stream = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._stream is not None
+
+    def start(self):
+        """
+        Open the input stream and start filling the ring
+        """
+        if self._stream is not None:
+            return
+        self._stream = sd.InputStream(samplerate=self.samplerate,
+                                      blocksize=self.blocksize,
+                                      channels=self.channels,
+                                      dtype='float32',
+                                      callback=self._callback)
+        self._stream.start()
+        logger.debug(f'input ring armed ({len(self._buffer)} frames)')
+
+    def stop(self):
+        """
+        Close the input stream
+        """
+        if self._stream is None:
+            return
+        self._stream.stop()
+        self._stream.close()
+        self._stream = None
+        with self._lock:
+            self._sink = None
+            self._filled = 0
+        logger.debug('input ring disarmed')
+
+    def attach(self, sink: Any, preroll: float):
+        """
+        Hand the last `preroll` seconds to `sink`, then forward all further
+        input to it instead of the ring
+
+        :param sink: An input stream callback
+        :param preroll: Seconds of buffered input to hand over
+        """
+        with self._lock:
+            n = min(int(preroll * self.samplerate), self._filled)
+            start = self._pos - n
+            if start >= 0:
+                block = self._buffer[start:self._pos].copy()
+            else:
+                block = np.concatenate((self._buffer[start:],
+                                        self._buffer[:self._pos]))
+            sink(block, n, None, None)
+            self._sink = sink
+        logger.debug(f'handed over {n / self.samplerate * 1000:.0f}ms '
+                     f'pre-roll')
+
+    def detach(self):
+        """
+        Stop forwarding input, fill the ring again
+        """
+        with self._lock:
+            self._sink = None
+            self._filled = 0
+
+    def _callback(self, indata, frames, time, status):
+        with self._lock:
+            if self._sink is not None:
+                self._sink(indata, frames, time, status)
+                return
+            size = len(self._buffer)
+            if frames >= size:
+                self._buffer[:] = indata[-size:]
+                self._pos = 0
+            else:
+                end = self._pos + frames
+                if end <= size:
+                    self._buffer[self._pos:end] = indata
+                else:
+                    split = size - self._pos
+                    self._buffer[self._pos:] = indata[:split]
+                    self._buffer[:end - size] = indata[split:]
+                self._pos = end % size
+            self._filled = min(self._filled + frames, size)
+
+
+class Recorder:
+    """
+    Records from the microphone straight to a file.
+
+    The input stream's callback puts each block into a bounded queue, which
+    a writer thread drains into a `soundfile.SoundFile`. Memory use does not
+    depend on the duration of the recording, and the file is complete as
+    soon as the last blocks are written after `stop`.
+
+    If an armed `InputRing` with matching samplerate and channels is given,
+    the recording starts with `preroll` seconds of buffered input and no
+    device has to be opened.
+
+    If a `silence_threshold` is set, the RMS of every block is computed in
+    the callback and `record` stops early once `trailing_silence` seconds
+    below the threshold followed at least `min_duration` seconds of
+    recording.
+    """
+    def __init__(self, filename: str, samplerate: int = 44100,
+                 channels: int = 2, format: str = None,
+                 subtype: str = 'FLOAT', blocksize: int = 1024,
+                 keep: bool = False, max_blocks: int = 256,
+                 silence_threshold: float = None,
+                 trailing_silence: float = 2.0, min_duration: float = 0.,
+                 ring: InputRing = None, preroll: float = 0.):
+        """
+        :param filename: The path of the file to record to
+        :param samplerate: The recording samplerate
+        :param channels: Number of channels to record
+        :param format: The soundfile format of the file, `None` to derive
+                       it from the file extension
+        :param subtype: The soundfile subtype of the file
+        :param blocksize: Frames per input callback
+        :param keep: `True` to also keep the recording in memory
+        :param max_blocks: Blocks the queue can hold before blocks are
+                           dropped
+        :param silence_threshold: RMS level [0.0 .. 1.0] below which a
+                                  block counts as silent. `None` disables
+                                  the early stop.
+        :param trailing_silence: Seconds of silence which end the recording
+        :param min_duration: Seconds to record before an early stop
+        :param ring: An armed `InputRing` to record from
+        :param preroll: Seconds of buffered input to start with
+        """
+        self.filename = filename
+        self.samplerate = samplerate
+        self.channels = channels
+        self.format = format
+        self.subtype = subtype
+        self.blocksize = blocksize
+        self.keep = keep
+        self.silence_threshold = silence_threshold
+        if ring is not None and not (ring.running
+                                     and ring.samplerate == samplerate
+                                     and ring.channels == channels):
+            ring = None
+        self.ring = ring
+        self.preroll = preroll
+        self._trailing_frames = int(trailing_silence * samplerate)
+        self._min_frames = int(min_duration * samplerate)
+        self._queue = queue.Queue(maxsize=max_blocks)
+        self._blocks = []
+        self._stream = None
+        self._writer = None
+        self._silence = threading.Event()
+        self._input_frames = 0
+        self._silent_frames = 0
+        self.frames = 0
+        self.dropped = 0
+        self.stop_latency = 0.
+        self.stopped_by = None
+
+    def start(self):
+        """
+        Open the file and the input stream and start recording
+        """
+        self._writer = threading.Thread(target=self._write,
+                                        name='recorder-writer',
+                                        args=(sf.SoundFile(
+                                            self.filename, mode='w',
+                                            samplerate=self.samplerate,
+                                            channels=self.channels,
+                                            format=self.format,
+                                            subtype=self.subtype),))
+        self._writer.start()
+        if self.ring is not None:
+            self.ring.attach(self._callback, self.preroll)
+            return
+        self._stream = sd.InputStream(samplerate=self.samplerate,
+                                      blocksize=self.blocksize,
+                                      channels=self.channels,
+                                      dtype='float32',
+                                      callback=self._callback)
+        self._stream.start()
+
+    def stop(self):
+        """
+        Stop recording and wait until the file is complete
+        """
+        start = monotonic()
+        if self.ring is not None:
+            self.ring.detach()
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        self.stop_latency = monotonic() - start
+        logger.debug(f'recorded {self.frames} frames to {self.filename}, '
+                     f'{self.dropped} blocks dropped, file complete '
+                     f'{self.stop_latency * 1000:.1f}ms after stop')
+
+    def record(self, duration: float):
+        """
+        Record for `duration` seconds, or until trailing silence is detected
+
+        :param duration: The maximum time to record in seconds
+        :return: the recorded time in seconds
+        """
+        self.start()
+        try:
+            silence = self._silence.wait(duration)
+        finally:
+            self.stop()
+        self.stopped_by = 'silence' if silence else 'duration'
+        return self.duration
+
+    @property
+    def duration(self):
+        """
+        :return: the length of the recorded file in seconds
+        """
+        return self.frames / self.samplerate
+
+    @property
+    def data(self):
+        """
+        :return: the recorded samples, if the recorder keeps them
+        """
+        if not self._blocks:
+            return np.zeros((0, self.channels), dtype='float32')
+        return np.concatenate(self._blocks)
+
+    def _callback(self, indata, frames, time, status):
+        try:
+            self._queue.put_nowait(indata.copy())
+        except queue.Full:
+            self.dropped += 1
+        if self.silence_threshold is None:
+            return
+        self._input_frames += frames
+        if np.sqrt(np.mean(np.square(indata))) < self.silence_threshold:
+            self._silent_frames += frames
+        else:
+            self._silent_frames = 0
+        if self._input_frames >= self._min_frames and \
+                self._silent_frames >= self._trailing_frames:
+            self._silence.set()
+
+    def _write(self, soundfile: Any):
+        with soundfile:
+            while True:
+                block = self._queue.get()
+                if block is None:
+                    break
+                soundfile.write(block)
+                self.frames += len(block)
+                if self.keep:
+                    self._blocks.append(block)
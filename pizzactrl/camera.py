@@ -0,0 +1,434 @@
+import io
+import os
+import logging
+import threading
+from collections import deque
+from time import sleep, monotonic
+
+from typing import Any, Callable
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+FORMATS = {
+    '.jpg': 'jpeg',
+    '.jpeg': 'jpeg',
+    '.png': 'png',
+    '.h264': 'h264'
+}
+
+
+class CameraBackend:
+    """
+    Interface of the cameras used by `CameraManager`
+    """
+    # `True` if videos are h264 streams, which can be put into a container
+    encoded = True
+
+    def configure(self, resolution: tuple = None, framerate: int = None):
+        """
+        Set the resolution and/or framerate
+        """
+        raise NotImplementedError
+
+    def lock_exposure(self):
+        """
+        Fix exposure and white balance at their current values
+        """
+        raise NotImplementedError
+
+    def unlock_exposure(self):
+        """
+        Let exposure and white balance follow the scene again
+        """
+        raise NotImplementedError
+
+    def capture(self, output: Any, format: str, video_port: bool = False):
+        """
+        Take a photo into a file-like object or path
+        """
+        raise NotImplementedError
+
+    def start_recording(self, output: str, resize: tuple = None):
+        """
+        Record video into a file, scaled to `resize` if given
+        """
+        raise NotImplementedError
+
+    def wait_recording(self, duration: float):
+        raise NotImplementedError
+
+    def stop_recording(self):
+        raise NotImplementedError
+
+    def start_buffering(self, seconds: float, resize: tuple = None):
+        """
+        Start recording into a circular in-memory buffer holding the last
+        `seconds` of video, scaled to `resize` if given
+        """
+        raise NotImplementedError
+
+    def continue_recording(self, output: str):
+        """
+        Write the buffered video to `output` and continue recording until
+        `stop_recording`
+
+        :return: a list of further files the recording continues in, which
+                 follow `output` in this order
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PiCameraBackend(CameraBackend):
+    """
+    The Raspberry Pi camera
+    """
+    def __init__(self):
+        from picamera import PiCamera
+        self.camera = PiCamera()
+        self._buffer = None
+
+    def configure(self, resolution: tuple = None, framerate: int = None):
+        if framerate is not None:
+            self.camera.framerate = framerate
+        if resolution is not None:
+            self.camera.resolution = resolution
+
+    def lock_exposure(self):
+        self.camera.shutter_speed = self.camera.exposure_speed
+        self.camera.exposure_mode = 'off'
+        gains = self.camera.awb_gains
+        self.camera.awb_mode = 'off'
+        self.camera.awb_gains = gains
+        logger.debug(f'camera exposure locked at '
+                     f'{self.camera.shutter_speed}us')
+
+    def unlock_exposure(self):
+        self.camera.shutter_speed = 0
+        self.camera.exposure_mode = 'auto'
+        self.camera.awb_mode = 'auto'
+
+    def capture(self, output: Any, format: str, video_port: bool = False):
+        # Recordings use splitter port 1, stills from the video port use 0
+        self.camera.capture(output, format=format, use_video_port=video_port,
+                            splitter_port=0)
+
+    def start_recording(self, output: str, resize: tuple = None):
+        self.camera.start_recording(output, format='h264', resize=resize)
+
+    def wait_recording(self, duration: float):
+        self.camera.wait_recording(duration)
+
+    def stop_recording(self):
+        self.camera.stop_recording()
+        self._buffer = None
+
+    def start_buffering(self, seconds: float, resize: tuple = None):
+        from picamera import PiCameraCircularIO
+        self._buffer = PiCameraCircularIO(self.camera, seconds=seconds)
+        self.camera.start_recording(self._buffer, format='h264',
+                                    resize=resize)
+
+    def continue_recording(self, output: str):
+        # The part after the pre-roll goes to its own file, both are joined
+        # by the video post-processing
+        tail = output + '.tail'
+        self.camera.split_recording(tail)
+        with open(output, 'wb') as f:
+            self._buffer.copy_to(f)
+        return [tail]
+
+    def close(self):
+        self.camera.close()
+
+
+class FakeCamera(CameraBackend):
+    """
+    A camera which synthesizes frames with NumPy and writes real files, for
+    measuring the capture path without camera hardware.
+
+    Photos are written as binary PPM, videos as raw RGB frames at
+    `framerate`. Frames are at most `max_size` large to keep the file I/O
+    in reasonable bounds.
+    """
+    encoded = False
+
+    def __init__(self, framerate: int = 5, max_size: tuple = (640, 480),
+                 capture_delay: float = 0.):
+        """
+        :param framerate: Frames per second written while recording
+        :param max_size: Maximum frame size (width, height)
+        :param capture_delay: Simulated time to take a photo
+        """
+        self.framerate = framerate
+        self.max_size = max_size
+        self.capture_delay = capture_delay
+        self.resolution = max_size
+        self._resize = None
+        self.frames = 0
+        self.bytes_written = 0
+        self._t = 0
+        self._stop = threading.Event()
+        self._recorder = None
+        self._lock = threading.Lock()
+        self._buffer = None
+        self._output = None
+
+    def configure(self, resolution: tuple = None, framerate: int = None):
+        if resolution is not None:
+            self.resolution = resolution
+
+    def lock_exposure(self):
+        pass
+
+    def unlock_exposure(self):
+        pass
+
+    def frame(self, size: tuple = None):
+        """
+        :param size: The size of the frame, default is the resolution
+        :return: a synthetic RGB frame as array of shape (height, width, 3)
+        """
+        size = size or self.resolution
+        width = min(size[0], self.max_size[0])
+        height = min(size[1], self.max_size[1])
+        self._t += 1
+        gradient = np.add.outer(np.arange(height, dtype=np.uint16),
+                                np.arange(width, dtype=np.uint16))
+        gray = ((gradient + 4 * self._t) % 256).astype(np.uint8)
+        return np.repeat(gray[:, :, np.newaxis], 3, axis=2)
+
+    def capture(self, output: Any, format: str, video_port: bool = False):
+        if self.capture_delay > 0. and not video_port:
+            sleep(self.capture_delay)
+        frame = self.frame()
+        data = b'P6\n%d %d\n255\n' % (frame.shape[1], frame.shape[0]) + \
+            frame.tobytes()
+        if isinstance(output, str):
+            with open(output, 'wb') as f:
+                f.write(data)
+        else:
+            output.write(data)
+        self.frames += 1
+        self.bytes_written += len(data)
+
+    def start_recording(self, output: str, resize: tuple = None):
+        self._output = open(output, 'wb')
+        self._resize = resize
+        self._start()
+
+    def wait_recording(self, duration: float):
+        self._stop.wait(duration)
+
+    def stop_recording(self):
+        self._stop.set()
+        if self._recorder is not None:
+            self._recorder.join()
+            self._recorder = None
+        with self._lock:
+            if self._output is not None:
+                self._output.close()
+                self._output = None
+            self._buffer = None
+
+    def start_buffering(self, seconds: float, resize: tuple = None):
+        self._buffer = deque(maxlen=max(1, int(seconds * self.framerate)))
+        self._resize = resize
+        self._start()
+
+    def continue_recording(self, output: str):
+        with self._lock:
+            self._output = open(output, 'wb')
+            for data in self._buffer:
+                self._output.write(data)
+            self._buffer.clear()
+        return []
+
+    def _start(self):
+        self._stop.clear()
+        self._recorder = threading.Thread(target=self._record,
+                                          name='fake-camera')
+        self._recorder.start()
+
+    def _record(self):
+        interval = 1. / self.framerate
+        next_frame = monotonic()
+        while not self._stop.is_set():
+            data = self.frame(self._resize).tobytes()
+            with self._lock:
+                if self._output is not None:
+                    self._output.write(data)
+                    self.bytes_written += len(data)
+                else:
+                    self._buffer.append(data)
+            self.frames += 1
+            next_frame += interval
+            self._stop.wait(max(0., next_frame - monotonic()))
+
+
+BACKENDS = {
+    'picamera': PiCameraBackend,
+    'fake': FakeCamera
+}
+
+
+class CameraManager:
+    """
+    Keeps the camera warm in a single sensor mode at the photo resolution.
+    Videos are scaled down to the video resolution by the GPU, so switching
+    between photos and videos never changes the sensor mode.
+
+    Exposure and white balance follow the scene while the camera idles, so
+    they are settled whenever a capture starts. They are locked right
+    before a photo and for the duration of a recording, so the picture does
+    not change while it is taken. Photos are captured to memory and written
+    to disk on a background thread, and the shutter latency of every
+    capture is measured.
+    """
+    def __init__(self, camera: Any, photo_res: tuple, video_res: tuple,
+                 framerate: int = 15, warmup: float = 2.0,
+                 lock_exposure: bool = True):
+        """
+        :param camera: A `CameraBackend`
+        :param photo_res: The resolution of photos and of the sensor
+        :param video_res: The resolution of videos
+        :param framerate: The framerate of the sensor, which must be
+                          possible at `photo_res`
+        :param warmup: Seconds to let exposure and white balance settle
+        :param lock_exposure: `True` to keep exposure and white balance
+                              fixed during photos and recordings
+        """
+        self.camera = camera
+        self.photo_res = photo_res
+        self.video_res = video_res
+        self.framerate = framerate
+        self.warmup = warmup
+        self.lock_exposure = lock_exposure
+        self.buffering = False
+        self.latencies = deque(maxlen=100)
+
+    def warm_up(self):
+        """
+        Start the camera and let it settle. The resolution is not changed
+        afterwards.
+        """
+        self.camera.configure(resolution=self.photo_res,
+                              framerate=self.framerate)
+        sleep(self.warmup)
+        logger.info('camera warmed up')
+
+    def capture(self, path: str, video_port: bool = False,
+                on_saved: Callable = None):
+        """
+        Take a photo into memory and write it to `path` in the background
+
+        :param path: The file to save the photo to
+        :param video_port: `True` to capture from the video port, which is
+                           near instant but has lower quality
+        :param on_saved: Called without arguments once the file is written
+        :return: the shutter latency in seconds
+        """
+        if self.buffering:
+            # The camera is busy recording
+            video_port = True
+        stream = io.BytesIO()
+        start = monotonic()
+        if self.lock_exposure and not self.buffering:
+            self.camera.lock_exposure()
+        try:
+            self.camera.capture(
+                stream, format=FORMATS[os.path.splitext(path)[1].lower()],
+                video_port=video_port)
+        finally:
+            if self.lock_exposure and not self.buffering:
+                self.camera.unlock_exposure()
+        latency = monotonic() - start
+        self.latencies.append(latency)
+        logger.info(f'shutter latency {latency * 1000:.0f}ms '
+                    f'(video port: {video_port})')
+        threading.Thread(target=self._save, name='camera-save',
+                         args=(stream, path, on_saved)).start()
+        return latency
+
+    def arm(self, seconds: float):
+        """
+        Keep the last `seconds` of video in a circular buffer, so the next
+        recording starts with them
+
+        :param seconds: The length of the pre-roll
+        """
+        if self.buffering:
+            return
+        self.camera.start_buffering(seconds, resize=self.video_res)
+        self.buffering = True
+        logger.debug(f'camera buffering {seconds}s pre-roll')
+
+    def disarm(self):
+        """
+        Stop the circular buffer without recording
+        """
+        if self.buffering:
+            self.camera.stop_recording()
+            self.buffering = False
+
+    def record(self, path: str, duration: float):
+        """
+        Record a video. If the camera was armed, the video starts with the
+        buffered pre-roll.
+
+        :param path: The file to record to
+        :param duration: The time to record in seconds
+        :return: the list of files of the video, `path` and the files it
+                 continues in
+        """
+        start = monotonic()
+        parts = [path]
+        if self.lock_exposure:
+            self.camera.lock_exposure()
+        try:
+            if self.buffering:
+                parts += self.camera.continue_recording(path)
+                self.buffering = False
+            else:
+                self.camera.start_recording(path, resize=self.video_res)
+            latency = monotonic() - start
+            self.latencies.append(latency)
+            logger.info(f'recording started after {latency * 1000:.0f}ms')
+            self.camera.wait_recording(duration)
+            self.camera.stop_recording()
+        finally:
+            if self.lock_exposure:
+                self.camera.unlock_exposure()
+        return parts
+
+    def close(self):
+        self.camera.close()
+
+    @staticmethod
+    def _save(stream: Any, path: str, on_saved: Callable):
+        try:
+            with open(path, 'wb') as f:
+                f.write(stream.getbuffer())
+        except OSError:
+            logger.exception(f'could not save {path}')
+            return
+        if on_saved is not None:
+            on_saved()
+
+    def stats(self):
+        """
+        :return: a dict with the mean and maximum shutter latency in seconds
+        """
+        latencies = list(self.latencies)
+        return {
+            'captures': len(latencies),
+            'mean_latency': (sum(latencies) / len(latencies)
+                             if latencies else None),
+            'max_latency': max(latencies) if latencies else None
+        }
@@ -0,0 +1,104 @@
+import functools
+
+from typing import Any
+
+import numpy as np
+
+
+GAMMA = 2.2         # Gamma of the perceived brightness of the LED strips
+EXP_RATE = 5.       # Steepness of the exponential curve
+
+
+def _linear(x):
+    return x
+
+
+def _gamma(x):
+    # Perceived brightness rises linearly
+    return np.power(x, GAMMA)
+
+
+def _ease_in_out(x):
+    return np.power(0.5 - 0.5 * np.cos(np.pi * x), GAMMA)
+
+
+def _exponential(x):
+    return np.expm1(EXP_RATE * x) / np.expm1(EXP_RATE)
+
+
+SHAPES = {
+    'linear': _linear,
+    'gamma': _gamma,
+    'ease-in-out': _ease_in_out,
+    'exponential': _exponential
+}
+
+
+@functools.lru_cache(maxsize=64)
+def curve(shape: str, steps: int):
+    """
+    Get the PWM values of a fade from 0 to 1. Curves are computed once and
+    shared, the returned array is read-only.
+
+    :param shape: One of `SHAPES`
+    :param steps: The number of steps of the fade
+    :return: an array of `steps + 1` values from 0.0 to 1.0
+    """
+    values = SHAPES[shape](np.linspace(0., 1., max(1, steps) + 1))
+    values.flags.writeable = False
+    return values
+
+
+def fade(shape: str, steps: int, start: float, target: float,
+         out: Any = None):
+    """
+    Scale a curve to a fade from `start` to `target`. Fades out play the
+    curve backwards, so they look like the mirrored fade in.
+
+    :param shape: One of `SHAPES`
+    :param steps: The number of steps of the fade
+    :param start: The value to fade from
+    :param target: The value to fade to
+    :param out: An array of at least `steps + 1` values to write the fade
+                into, instead of allocating a new one
+    :return: an array of `steps + 1` values from `start` to `target`
+    """
+    values = curve(shape, steps)
+    if out is None:
+        out = np.empty_like(values)
+    else:
+        out = out[:len(values)]
+    if target >= start:
+        np.multiply(values, target - start, out=out)
+        out += start
+    else:
+        np.multiply(values[::-1], start - target, out=out)
+        out += target
+    return out
+
+
+@functools.lru_cache(maxsize=16)
+def blink(shape: str, tick_rate: int, on_time: float, off_time: float,
+          fade_in_time: float = 0., fade_out_time: float = 0.):
+    """
+    Get the PWM values of one blink period, sampled at `tick_rate`. The
+    returned array is read-only.
+
+    :param shape: One of `SHAPES`, used for fading in and out
+    :param tick_rate: Samples per second
+    :param on_time: Seconds at full brightness
+    :param off_time: Seconds off
+    :param fade_in_time: Seconds to fade in
+    :param fade_out_time: Seconds to fade out
+    :return: an array with the values of one period
+    """
+    n_in, n_on, n_out, n_off = (
+        max(0, int(round(t * tick_rate)))
+        for t in (fade_in_time, on_time, fade_out_time, off_time))
+    values = np.concatenate([
+        curve(shape, n_in)[:n_in],
+        np.ones(n_on),
+        curve(shape, n_out)[::-1][:n_out],
+        np.zeros(n_off)])
+    values.flags.writeable = False
+    return values
@@ -16,6 +16,31 @@ _SFX_SOUNDS = 'sounds/'
 _REC_FILES = '/home/pi/pizzafiles/'
 
 USB_STICK = _REC_FILES + '.stick'
+REC_PATH = _REC_FILES
+
+# RAM-backed directory where artifacts are written before they are flushed
+# to the stick
+STAGING_PATH = '/dev/shm/pizzabox/'
+
+PCM_CACHE = '/home/pi/.cache/pizzabox/pcm/'
+
+# Frame positions of the scroll, written by `pizza-calibrate`
+FRAME_INDEX = '/home/pi/.config/pizzabox/frames.json'
+
+# Extensions of storyboard sounds, in order of preference
+SOUND_EXTENSIONS = ('.wav', '.flac', '.ogg')
+
+
+def _story_sound(name: str):
+    """
+    Find the storyboard sound file for `name`. Compressed sources are used if
+    no WAV file is present.
+    """
+    for ext in SOUND_EXTENSIONS:
+        path = _STORY_SOUNDS + name + ext
+        if os.path.exists(path):
+            return path
+    return _STORY_SOUNDS + name + SOUND_EXTENSIONS[0]
 
 
 class FileType(Enum):
@@ -33,6 +58,8 @@ class FileHandle:
     def __init__(self, name: str, filetype: FileType):
         self.name = name
         self.filetype = filetype
+        # Storyboard sounds are looked up on disk once, on first use
+        self._path = None
         # Create a uuid and fitting folder if not present
         # All RecFiles for this session will be added to this foldere
         if FileHandle.uuid is None:
@@ -49,12 +76,17 @@ class FileHandle:
         Return the file path as a string
         """
         return {
-            FileType.STORY: lambda: (_STORY_SOUNDS + self.name + '.wav'),
+            FileType.STORY: self._story_path,
             FileType.SFX: lambda: (SOUNDS_PATH + self.name
                                    + '.wav'),
             FileType.REC: lambda: (_REC_FILES + FileHandle.uuid + self.name)
         }[self.filetype]()
 
+    def _story_path(self):
+        if self._path is None:
+            self._path = _story_sound(self.name)
+        return self._path
+
 
 class SfxFile(FileHandle):
     """
@@ -88,6 +120,7 @@ REC_CITY_DESC = RecFile('city_description.wav')
 REC_CITY_SOUND = RecFile('city_sound.wav')
 REC_DRAW_CITY = RecFile('city_video.h264')
 REC_CITY_PHOTO = RecFile('city_drawing.jpg')
+REC_SESSION = RecFile('session.json')
 
 SFX_ERROR = SfxFile('error')
 SFX_ERROR_DE = SfxFile('error-de')
@@ -1,17 +1,25 @@
 import logging
 import functools
-from time import sleep
+import os
+import json
+import threading
+import queue
+from enum import Enum, auto
+from time import sleep, monotonic
 
 from typing import Any, List
-from scipy.io.wavfile import write as writewav
-
-import sounddevice as sd
-import soundfile as sf
-import numpy as np
 
 from . import gpio_pins
+from .fs_names import PCM_CACHE, REC_SESSION, REC_PATH, STAGING_PATH, \
+                      FRAME_INDEX, FileHandle
+from .audio import AudioEngine, Recorder, InputRing, recording_format
+from .soundcache import SoundCache, Preloader, PCMStore
+from .postproc import Pipeline, job_for
+from .artifacts import ArtifactStore
+from .camera import CameraManager, BACKENDS as CAMERA_BACKENDS
+from .lights import Animator
+from .scroll import FrameIndex
 
-from picamera import PiCamera
 from gpiozero import Button, OutputDevice, PWMOutputDevice, PWMLED
 
 
@@ -21,7 +29,29 @@ logger = logging.getLogger(__name__)
 # Constants
 VIDEO_RES = (1920, 1080)  # Video Resolution
 PHOTO_RES = (2592, 1944)  # Photo Resolution
+CAMERA_BACKEND = 'picamera'  # One of camera.BACKENDS
 AUDIO_REC_SR = 44100      # Audio Recording Samplerate
+AUDIO_REC_CHANNELS = 2    # Audio Recording Channels
+AUDIO_REC_SUBTYPE = 'FLOAT'  # Audio Recording sample format (soundfile)
+REC_SILENCE_RMS = 0.01    # RMS level below which the microphone is silent
+REC_TRAILING_SILENCE = 2.0  # Silence which ends a recording early
+REC_MIN_DURATION = 2.0    # Minimum length of a recording with early stop
+REC_PREROLL = 0.3         # Buffered input a recording starts with
+REC_RING = 1.0            # Input kept while armed, at least REC_PREROLL
+REC_ARM_LEAD = 3.0        # Time before a recording the microphone opens
+SETTLE_TIME = 0.1         # Pause after each blocking hardware operation
+SOUNDCACHE_BYTES = 192 * 2**20  # Memory budget for decoded sounds
+STAGING_BYTES = 128 * 2**20  # Memory budget for staged artifacts
+VIDEO_BITRATE = 17000000  # Default bitrate of the picamera h264 encoder
+AUDIO_OUT_SR = 44100      # Audio Playback Samplerate
+AUDIO_BLOCKSIZE = 1024    # Frames per audio callback
+AUDIO_LATENCY = 'low'     # Output latency in seconds or 'low'/'high'
+SEEK_SPEED = 1.0          # Motor speed when seeking a frame
+SEEK_SLOW_SPEED = 0.3     # Motor speed for the last counts before a frame
+SEEK_SLOW_COUNTS = 20     # Counts before a frame at which seeking slows down
+REWIND_SPEED = 0.8        # Motor speed when rewinding
+REWIND_SLOW_SPEED = 0.3   # Motor speed when rewinding close to home
+REWIND_SLOW_COUNTS = 40   # Counts before home at which rewinding slows down
 
 
 class Motor:
@@ -79,15 +109,68 @@ class Motor:
 
 
 class ScrollSensor:
+    """
+    Feed sensors and endstop of a scroll.
+
+    Every edge of the low feed bit moves `position` one count in the
+    current `direction`, which is set by whoever drives the motor. The high
+    bit only signals the end of the tape, so it never interferes with the
+    counting. A callback can be set to fire when the position reaches a
+    target.
+    """
     def __init__(self, low_bit: int, high_bit: int, endstop: int):
         self._low = Button(low_bit, pull_up=False)
         self._high = Button(high_bit, pull_up=False)
         self._end = Button(endstop, pull_up=False)
 
-        # self._low.when_released = self._callback
+        self._lock = threading.Lock()
+        self.position = 0
+        # `True` once the position was reset at home
+        self.homed = False
+        # 1 when the scroll moves forward, -1 backward
+        self.direction = 1
+        self.edges = 0
+        self._target = None
+        self._target_callback = None
+        self._target_dir = 1
+
+        self._low.when_pressed = self._count
+        self._low.when_released = self._count
+
+    def _count(self):
+        callback = None
+        with self._lock:
+            self.position += self.direction
+            self.edges += 1
+            if self._target is not None and \
+                    (self.position - self._target) * self._target_dir >= 0:
+                callback = self._target_callback
+                self._target = self._target_callback = None
+        if callback is not None:
+            logger.debug(f'target position {self.position} reached')
+            callback()
+
+    def set_target(self, target: int, callback: Any):
+        """
+        Call `callback` once when `position` reaches `target`, moving in
+        either direction
 
-        # self.direction = 0
-        # self.count = 0
+        :param target: The position in counts, `None` to remove the target
+        :param callback: Called without arguments
+        """
+        with self._lock:
+            self._target = target
+            self._target_callback = callback if target is not None else None
+            self._target_dir = 1 if target is None or \
+                target >= self.position else -1
+
+    def reset(self, position: int = 0):
+        """
+        Set the current position, e.g. when the scroll is at home
+        """
+        with self._lock:
+            self.position = position
+            self.homed = True
 
     @property
     def is_home(self):
@@ -115,6 +198,61 @@ class ScrollSensor:
         self._end.when_pressed = callback
 
 
+class Gate:
+    """
+    Serializes access to the hardware. Only one blocking operation may run at
+    a time, other callers sleep on a condition until the gate is released.
+
+    Keeps counters on how often callers had to wait and for how long.
+    """
+    def __init__(self, settle_time: float = SETTLE_TIME):
+        self._cond = threading.Condition()
+        self._held = False
+        self.settle_time = settle_time
+        self.acquisitions = 0
+        self.contentions = 0
+        self.wait_time = 0.
+
+    @property
+    def held(self):
+        """
+        :return: `True` if a blocking operation is running
+        """
+        return self._held
+
+    def acquire(self):
+        """
+        Wait until the gate is free, then take it
+        """
+        with self._cond:
+            if self._held:
+                self.contentions += 1
+                start = monotonic()
+                self._cond.wait_for(lambda: not self._held)
+                self.wait_time += monotonic() - start
+            self._held = True
+            self.acquisitions += 1
+
+    def release(self):
+        """
+        Free the gate and wake up one waiting caller
+        """
+        with self._cond:
+            self._held = False
+            self._cond.notify()
+
+    def stats(self):
+        """
+        :return: a dict with the acquisition, contention and wait counters
+        """
+        with self._cond:
+            return {
+                'acquisitions': self.acquisitions,
+                'contentions': self.contentions,
+                'wait_time': self.wait_time
+            }
+
+
 class PizzaHAL:
     """
     This class holds a represenation of the pizza box hardware and provides
@@ -128,7 +266,8 @@ class PizzaHAL:
 
     """
 
-    def __init__(self):
+    def __init__(self, soundcache_bytes: int = SOUNDCACHE_BYTES,
+                 pcm_cache: str = PCM_CACHE, frame_index: str = FRAME_INDEX):
         self.btn_forward = Button(gpio_pins.BTN_FORWARD_GPIO)
         self.btn_back = Button(gpio_pins.BTN_BACK_GPIO)
 
@@ -144,68 +283,341 @@ class PizzaHAL:
 
         self.motor_lr = Motor(*gpio_pins.MOTOR_CTRL_LR)
         self.motor_ud = Motor(*gpio_pins.MOTOR_CTRL_UPDOWN)
+        self.frames = FrameIndex.load(frame_index)
         self.led_layer = PWMOutputDevice(gpio_pins.LED_LAYER)
         self.led_backlight = PWMOutputDevice(gpio_pins.LED_BACKLIGHT)
+        # All LEDs are animated by `lights`, do not set them directly
+        self.lights = Animator({
+            'led_layer': self.led_layer,
+            'led_backlight': self.led_backlight,
+            'led_btn_fwd': self.led_btn_fwd,
+            'led_btn_back': self.led_btn_back
+        })
 
         self.camera = None
-        self.soundcache = {}
+        store = None
+        if pcm_cache is not None:
+            try:
+                store = PCMStore(pcm_cache)
+            except OSError:
+                logger.exception(f'cannot use pcm cache at {pcm_cache}')
+        self.audio = AudioEngine(samplerate=AUDIO_OUT_SR,
+                                 blocksize=AUDIO_BLOCKSIZE,
+                                 latency=AUDIO_LATENCY)
+        self.soundcache = SoundCache(max_bytes=soundcache_bytes, store=store,
+                                     samplerate=self.audio.samplerate)
+        self.input_ring = None
+        self.postproc = Pipeline()
+        self.artifacts = ArtifactStore(
+            STAGING_PATH, REC_PATH, max_staged_bytes=STAGING_BYTES,
+            on_recovered=functools.partial(postprocess_recovered, self))
+
+        # Gate for operations on unnamed devices, other devices get their
+        # own gate from `gate_for`
+        self.gate = Gate()
+        self.gates = {}
+        self._gates_lock = threading.Lock()
+        self.recorded_bytes = 0
+        self.session = {'recordings': {}}
+
+
+def gate_for(hal: PizzaHAL, device: str = None):
+    """
+    :param hal: The hardware abstraction object
+    :param device: The name of a device, `None` for the default gate
+    :return: the `Gate` serializing operations on `device`
+    """
+    if device is None:
+        return hal.gate
+    with hal._gates_lock:
+        gate = hal.gates.get(device, None)
+        if gate is None:
+            gate = hal.gates[device] = Gate(settle_time=hal.gate.settle_time)
+        return gate
+
 
-        self.blocked = False
+def gate_stats(hal: PizzaHAL):
+    """
+    :param hal: The hardware abstraction object
+    :return: a dict of the stats of all gates by device name
+    """
+    stats = {'default': hal.gate.stats()}
+    with hal._gates_lock:
+        gates = dict(hal.gates)
+    for device, gate in gates.items():
+        stats[device] = gate.stats()
+    return stats
+
+
+def _find_hal(args, kwargs):
+    """
+    Find the `PizzaHAL` in the arguments of a call, passed either by keyword
+    or positionally.
+    """
+    hal = kwargs.get('hal', None)
+    if hal is None:
+        for arg in args:
+            if isinstance(arg, PizzaHAL):
+                return arg
+    return hal
 
 
-def blocking(func):
+def blocking(func=None, settle: bool = True, device: str = None):
+    """
+    Decorator for hardware operations which must not overlap. Holds the gate
+    of the `PizzaHAL` passed to the function while it runs, then waits for
+    the gate's settle time.
+
+    Use as `@blocking`, or as `@blocking(device=..., settle=False)` to only
+    serialize operations on the same device and/or to return without the
+    settle time.
+    """
+    if func is None:
+        return functools.partial(blocking, settle=settle, device=device)
+
     @functools.wraps(func)
     def _wrapper(*args, **kwargs):
-        hal = kwargs.get('hal', None)
-        if hal is not None:
-            logger.debug('blocking...')
-            while hal.blocked:
-                pass
-            hal.blocked = True
-        func(*args, **kwargs)
+        hal = _find_hal(args, kwargs)
+        gate = None
+        settle_time = SETTLE_TIME if settle else 0.
         if hal is not None:
-            logger.debug('unblocking')
-            hal.blocked = False
-        sleep(0.1)
+            logger.debug(f'blocking {device or ""}...')
+            gate = gate_for(hal, device)
+            gate.acquire()
+            if settle:
+                settle_time = gate.settle_time
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if gate is not None:
+                logger.debug(f'unblocking {device or ""}')
+                gate.release()
+            if settle_time > 0.:
+                sleep(settle_time)
     return _wrapper
 
 
+class MoveEnd(Enum):
+    """
+    The ways a move of a scroll can end
+    """
+    SENSOR = auto()
+    END_OF_TAPE = auto()
+    TIMEOUT = auto()
+
+
+def _move(motor: Motor, sensor: ScrollSensor, speed: float, timeout: float,
+          target: int=None, endstop: bool=True, marker: Any=None):
+    """
+    Run a motor until a sensor stops it. The sensor callbacks stop the motor
+    and wake up the calling thread, which sleeps at most `timeout` seconds.
+
+    :param motor: The motor moving the scroll
+    :param sensor: The sensor of the scroll
+    :param speed: float [-1.0 .. 1.0]
+    :param timeout: Safety time in seconds after which the motor is stopped
+    :param target: Position in sensor counts to stop at, or `None`
+    :param endstop: `True` to stop at the endstop
+    :param marker: Called at the endstop instead, if `endstop` is `False`
+    :return: a tuple of the `MoveEnd` and the time moved in seconds
+    """
+    ends = queue.Queue(maxsize=1)
+
+    def _stop(move_end: MoveEnd):
+        def _callback():
+            motor.off()
+            try:
+                ends.put_nowait(move_end)
+            except queue.Full:
+                pass
+        return _callback
+
+    sensor.eot_callback = _stop(MoveEnd.END_OF_TAPE)
+    sensor.stop_callback = _stop(MoveEnd.SENSOR) if endstop else marker
+    if target is not None:
+        sensor.set_target(target, _stop(MoveEnd.SENSOR))
+
+    start = monotonic()
+    sensor.direction = 1 if speed > 0 else -1
+    motor.speed = speed
+    try:
+        move_end = ends.get(timeout=timeout)
+    except queue.Empty:
+        move_end = MoveEnd.TIMEOUT
+    finally:
+        motor.off()
+        sensor.set_target(None, None)
+        sensor.stop_callback = None
+        sensor.eot_callback = None
+    return move_end, monotonic() - start
+
+
 @blocking
 def advance(motor: Motor, sensor: ScrollSensor, speed: float=0.3,
-            direction: bool=True):
+            direction: bool=True, counts: int=None, **kwargs):
     """
     Move the motor controlling the up-down scroll a given distance at a
-    given speed.
-
+    given speed. Returns as soon as a sensor stops the motor.
+
+    :param motor: The motor moving the scroll
+    :param sensor: The sensor of the scroll
+    :param speed: float [0.0 .. 1.0]
+    :param direction: `True` to move forward
+    :param counts: int
+                Default `None`, the distance in sensor counts. The motor
+                stops as soon as it is reached. `None` moves until the
+                endstop or the safety timeout.
+    :return: a tuple of the `MoveEnd` and the time moved in seconds
     """
     logger.debug(f'advance(motor={motor}, sensor={sensor}, speed={speed},'
-                 f'direction={direction})')
+                 f'direction={direction}, counts={counts})')
     if sensor.is_home and not direction:
         logger.debug('home reached, not advancing.')
-        return
+        return MoveEnd.SENSOR, 0.
 
-    sensor.stop_callback = motor.off
-    sensor.eot_callback = motor.off
-    motor.speed = speed if direction else -speed
+    start = sensor.position
+    target = None
+    if counts is not None:
+        target = start + (counts if direction else -counts)
     # Safety catch
-    sleeptime = abs(5 / (speed * 10))
-    sleep(sleeptime)
-    motor.off()
-    sensor.stop_callback = None
-    sensor.eot_callback = None
+    timeout = abs(5 / (speed * 10))
+    move_end, elapsed = _move(motor, sensor,
+                              speed if direction else -speed, timeout,
+                              target=target)
+    logger.debug(f'advanced {sensor.position - start} counts in '
+                 f'{elapsed:.3f}s ({move_end})')
+    return move_end, elapsed
 
 
 @blocking
 def rewind(motor: Motor, sensor: ScrollSensor, direction: bool=True,
-           max_time: float=13.2):
+           max_time: float=13.2, speed: float=REWIND_SPEED,
+           slow_speed: float=REWIND_SLOW_SPEED,
+           slow_counts: int=REWIND_SLOW_COUNTS):
+    """
+    Move the up-down scroll back to its starting position. Returns as soon
+    as the end of tape sensor stops the motor.
+
+    If the position of the scroll is known, it moves at `speed` and slows
+    down to `slow_speed` for the last `slow_counts` counts. Otherwise it
+    moves at `slow_speed` all the way.
+
+    :param motor: The motor moving the scroll
+    :param sensor: The sensor of the scroll
+    :param direction: `True` to move backward
+    :param max_time: Safety time in seconds after which the motor is stopped
+    :param speed: float [0.0 .. 1.0]
+    :param slow_speed: float [0.0 .. 1.0]
+    :param slow_counts: The distance from home in counts to move at
+                        `slow_speed`
+    :return: a tuple of the `MoveEnd` and the time moved in seconds
+    """
     if sensor.is_home:
-        return
-    sensor.eot_callback = motor.off
-    sensor.stop_callback = None
-    motor.speed = -0.3 if direction else 0.3
-    # Safety catch
-    sleep(max_time)
-    motor.off()
+        sensor.reset()
+        return MoveEnd.END_OF_TAPE, 0.
+    sign = -1 if direction else 1
+    move_end, elapsed = MoveEnd.SENSOR, 0.
+    if direction and sensor.homed and sensor.position > slow_counts:
+        move_end, elapsed = _move(motor, sensor, sign * speed, max_time,
+                                  target=slow_counts, endstop=False)
+        if move_end is MoveEnd.END_OF_TAPE and not sensor.is_home:
+            # The counted position was wrong, finish slowly
+            sensor.homed = False
+            move_end = MoveEnd.SENSOR
+    if move_end is MoveEnd.SENSOR:
+        move_end, slow = _move(motor, sensor, sign * slow_speed,
+                               max(0., max_time - elapsed), endstop=False)
+        elapsed += slow
+    if sensor.is_home:
+        sensor.reset()
+    else:
+        # Nobody checked where the scroll stopped
+        sensor.homed = False
+        logger.warning(f'rewind ended by {move_end} away from home')
+    logger.info(f'rewound in {elapsed:.1f}s ({move_end})')
+    return move_end, elapsed
+
+
+@blocking
+def calibrate(motor: Motor, sensor: ScrollSensor, speed: float=0.3,
+              max_time: float=60.):
+    """
+    Drive the scroll from home to the end of the tape and record the
+    position of every frame mark. The scroll must be at home.
+
+    :param motor: The motor moving the scroll
+    :param sensor: The sensor of the scroll
+    :param speed: float [0.0 .. 1.0]
+    :param max_time: Safety time in seconds after which the motor is stopped
+    :return: the `FrameIndex`, or `None` if the run did not reach the end
+             of the tape
+    """
+    sensor.reset()
+    frames = [{'position': 0, 'time': 0.}]
+    start = monotonic()
+
+    def _mark():
+        frames.append({'position': sensor.position,
+                       'time': monotonic() - start})
+        logger.debug(f'frame {len(frames) - 1} at {sensor.position}')
+
+    move_end, elapsed = _move(motor, sensor, speed, max_time,
+                              endstop=False, marker=_mark)
+    if move_end is not MoveEnd.END_OF_TAPE:
+        logger.error(f'calibration ended by {move_end} after '
+                     f'{elapsed:.1f}s')
+        return None
+    logger.info(f'calibrated {len(frames)} frames, {sensor.position} counts '
+                f'in {elapsed:.1f}s')
+    return FrameIndex(frames, end=sensor.position, duration=elapsed,
+                      speed=speed)
+
+
+@blocking
+def seek(motor: Motor, sensor: ScrollSensor, index: FrameIndex, frame: int,
+         speed: float=SEEK_SPEED, slow_speed: float=SEEK_SLOW_SPEED,
+         slow_counts: int=SEEK_SLOW_COUNTS):
+    """
+    Move the scroll directly to a frame of the index. The scroll moves at
+    `speed` and slows down to `slow_speed` for the last `slow_counts`
+    counts, so it does not overshoot. The position of the sensor must be
+    known, see `ScrollSensor.homed`.
+
+    :param motor: The motor moving the scroll
+    :param sensor: The sensor of the scroll
+    :param index: The `FrameIndex` of the scroll
+    :param frame: The number of the frame, 0 is home
+    :param speed: float [0.0 .. 1.0]
+    :param slow_speed: float [0.0 .. 1.0]
+    :param slow_counts: The distance in counts to move at `slow_speed`
+    :return: a tuple of the `MoveEnd` and the time moved in seconds
+    """
+    target = index.position(frame)
+    distance = target - sensor.position
+    if distance == 0:
+        return MoveEnd.SENSOR, 0.
+    sign = 1 if distance > 0 else -1
+    move_end, elapsed = MoveEnd.SENSOR, 0.
+    if abs(distance) > slow_counts:
+        # Safety catch at twice the expected time
+        move_end, elapsed = _move(
+            motor, sensor, sign * speed,
+            2 * index.eta(distance - sign * slow_counts, speed) + 1.,
+            target=target - sign * slow_counts, endstop=False)
+    if move_end is MoveEnd.SENSOR:
+        move_end, slow = _move(
+            motor, sensor, sign * slow_speed,
+            2 * index.eta(target - sensor.position, slow_speed) + 1.,
+            target=target, endstop=False)
+        elapsed += slow
+    if move_end is MoveEnd.END_OF_TAPE and sensor.is_home:
+        # Seeking home races the end of tape sensor against the count
+        sensor.reset()
+        if target == 0:
+            move_end = MoveEnd.SENSOR
+    logger.debug(f'seek to frame {frame} ended by {move_end} at '
+                 f'{sensor.position} after {elapsed:.3f}s')
+    return move_end, elapsed
 
 
 def turn_off(hal: PizzaHAL):
@@ -214,78 +626,92 @@ def turn_off(hal: PizzaHAL):
 
     :param hal: The hardware abstraction object
     """
-    hal.led_btn_back.off()
-    hal.led_btn_fwd.off()
-    hal.led_layer.off()
-    hal.led_backlight.off()
+    hal.lights.off()
     hal.btn_back.when_pressed = None
     hal.btn_back.when_held = None
     hal.btn_forward.when_pressed = None
     hal.btn_forward.when_held = None
+    hal.btn_forward.when_released = None
     hal.motor_ud.off()
     hal.motor_lr.off()
+    disarm_input(hal)
+    if hal.camera is not None:
+        hal.camera.disarm()
+
+
+class UserInput(Enum):
+    """
+    The ways a `wait_for_input` can end
+    """
+    FORWARD = auto()
+    BACK = auto()
+    TIMEOUT = auto()
 
 
 def wait_for_input(hal: PizzaHAL=None, go_callback: Any=None,
-                   back_callback: Any=None, **kwargs):
+                   back_callback: Any=None, timeout: float=None,
+                   timeout_callback: Any=None, **kwargs):
     """
     Blink leds on buttons. Wait until the user presses a button, then execute
-    the appropriate callback
+    the appropriate callback. The calling thread sleeps until a button
+    callback wakes it up.
 
     :param hal: The hardware abstraction object
     :param go_callback: called when button 'go' is pressed
     :param back_callback: called whan button 'back' is pressed
+    :param timeout: float
+                Default `None`, time in seconds to wait before giving up.
+                `None` waits forever.
+    :param timeout_callback: called when the timeout expires
+    :return: a tuple of the `UserInput` which ended the wait and the time
+             waited in seconds
     """
-    hal.led_btn_fwd.blink(0.3, 0.3, 0.15, 0.15)
-    hal.led_btn_back.blink(0.3, 0.3, 0.15, 0.15)
-
-    hal.blocked = True
-
-    hal.btn_forward.when_pressed = \
-        _wrap_wait_btn(hal=hal, callback=go_callback, **kwargs)
-
-    hal.btn_back.when_pressed = \
-        _wrap_wait_btn(hal=hal, callback=back_callback, **kwargs)
+    answers = queue.Queue(maxsize=1)
 
-    sleep(0.5)
+    def _pressed(user_input: UserInput):
+        def _callback():
+            try:
+                answers.put_nowait(user_input)
+            except queue.Full:
+                pass
+        return _callback
 
-    while hal.blocked:
-        pass
+    hal.lights.blink('led_btn_fwd', 0.3, 0.3, 0.15, 0.15)
+    hal.lights.blink('led_btn_back', 0.3, 0.3, 0.15, 0.15)
 
+    start = monotonic()
+    hal.btn_forward.when_pressed = _pressed(UserInput.FORWARD)
+    hal.btn_back.when_pressed = _pressed(UserInput.BACK)
 
-def _wrap_wait_btn(hal: PizzaHAL=None, callback: Any=None, **kwargs):
-    @functools.wraps(callback)
-    def wrapper():
-        hal.blocked = True
-        if callback is not None:
-            callback(hal=hal, **kwargs)
-        hal.btn_forward.when_pressed = None
-        hal.btn_back.when_pressed = None
-        hal.led_btn_back.off()
-        hal.led_btn_fwd.off()
-        hal.blocked = False
-    return wrapper
+    try:
+        user_input = answers.get(timeout=timeout)
+    except queue.Empty:
+        user_input = UserInput.TIMEOUT
+    elapsed = monotonic() - start
 
+    hal.btn_forward.when_pressed = None
+    hal.btn_back.when_pressed = None
+    hal.lights.set('led_btn_back', 0.)
+    hal.lights.set('led_btn_fwd', 0.)
 
-def _fade_led(led_pin: PWMOutputDevice, intensity: float, fade: float = 1.0,
-              steps: int = 100):
-    brightness = led_pin.value
-    step = (intensity - brightness) / float(steps)
-    wait = fade / float(steps)
+    logger.debug(f'wait_for_input: {user_input} after {elapsed:.3f}s')
 
-    if step != 0.:
-        for i in np.arange(brightness, intensity, step):
-            led_pin.value = i
-            sleep(wait)
+    callback = {
+        UserInput.FORWARD: go_callback,
+        UserInput.BACK: back_callback,
+        UserInput.TIMEOUT: timeout_callback
+    }[user_input]
+    if callback is not None:
+        callback(hal=hal, **kwargs)
 
-    led_pin.value = intensity
+    return user_input, elapsed
 
 
-@blocking
 def light_layer(hal: PizzaHAL, intensity: float, fade: float = 0.0,
-                steps: int = 100, **kwargs):
+                steps: int = None, shape: str = 'gamma', **kwargs):
     """
-    Turn on the light to illuminate the upper scroll
+    Turn on the light to illuminate the upper scroll. Returns immediately,
+    the light fades in the background.
 
     :param hal: The hardware abstraction object
     :param fade: float
@@ -293,19 +719,20 @@ def light_layer(hal: PizzaHAL, intensity: float, fade: float = 0.0,
     :param intensity: float
                 Intensity of the light in percent
     :param steps: int
-                How many steps for the fade (default: 10)
+                How many steps for the fade (default: one per tick of the
+                animator)
+    :param shape: str
+                The fade curve, one of `curves.SHAPES` (default: 'gamma')
+    :return: the `Animation`, which can be waited for
     """
-    if fade > 0.:
-        _fade_led(hal.led_layer, intensity, fade, steps)
-    else:
-        hal.led_layer.value = intensity
+    return hal.lights.fade('led_layer', intensity, fade, steps, shape)
 
 
-@blocking
 def backlight(hal: PizzaHAL, intensity: float, fade: float = 0.0,
-              steps: int = 100, **kwargs):
+              steps: int = None, shape: str = 'gamma', **kwargs):
     """
-    Turn on the backlight
+    Turn on the backlight. Returns immediately, the light fades in the
+    background.
 
     :param hal: The hardware abstraction object
     :param fade: float
@@ -313,77 +740,250 @@ def backlight(hal: PizzaHAL, intensity: float, fade: float = 0.0,
     :param intensity: float
                 Intensity of the light in percent
     :param steps: int
-                How many steps for the fade (default: 10)
+                How many steps for the fade (default: one per tick of the
+                animator)
+    :param shape: str
+                The fade curve, one of `curves.SHAPES` (default: 'gamma')
+    :return: the `Animation`, which can be waited for
     """
-    if fade > 0.:
-        _fade_led(hal.led_backlight, intensity, fade, steps)
-    else:
-        hal.led_backlight.value = intensity
+    return hal.lights.fade('led_backlight', intensity, fade, steps,
+                           shape)
 
 
-@blocking
+@blocking(device='audio_out', settle=False)
 def play_sound(hal: PizzaHAL, sound: Any, **kwargs):
     """
-    Play a sound.
+    Play a sound. Returns shortly before the sound ends, so a sound played
+    next follows without a gap.
 
     :param hal: The hardware abstraction object
     :param sound: The sound to be played
     """
     # Extract data and sampling rate from file
+    data, fs = hal.soundcache.get(sound)
+    clip = hal.audio.play(data, fs)
     try:
-        data, fs = hal.soundcache.get(str(sound), sf.read(str(sound), dtype='float32'))
-        sd.play(data, fs)
-        sd.wait()  # Wait until file is done playing
+        clip.queued.wait()
     except KeyboardInterrupt:
         logger.debug('skipped playback')
-        # sd.stop()
+        hal.audio.cancel()
 
 
-@blocking
+@blocking(device='audio_in')
 def record_sound(hal: PizzaHAL, filename: Any, duration: int,
-                 cache: bool = False, **kwargs):
+                 cache: bool = False, format: str = None, subtype: str = None,
+                 channels: int = None, samplerate: int = None,
+                 stop_on_silence: bool = False, min_duration: float = None,
+                 trailing_silence: float = None, **kwargs):
     """
-    Record sound using the microphone
+    Record sound using the microphone. The file is encoded on a writer
+    thread while recording. The recorded length is saved in the session
+    metadata.
+
+    If the input was armed with `arm_input`, the recording starts with
+    `REC_PREROLL` seconds of buffered input. The input is disarmed
+    afterwards.
+
+    The file is staged in the artifact store and post-processed once it is
+    flushed.
 
     :param hal: The hardware abstraction object
     :param filename: The path of the file to record to
     :param duration: The time to record in seconds
     :param cache: `True` to save recording to cache. Default is `False`
+    :param format: The file format, e.g. 'WAV' or 'FLAC'. Default is to
+                   derive it from the file extension. If the extension does
+                   not match, it is changed to the format's.
+    :param subtype: The sample format, e.g. 'PCM_16' or 'FLOAT'.
+                    Default is `AUDIO_REC_SUBTYPE` if the format supports
+                    it, else the format's default
+    :param channels: Number of channels. Default is `AUDIO_REC_CHANNELS`
+    :param samplerate: Default is `AUDIO_REC_SR`
+    :param stop_on_silence: `True` to stop before `duration` once the
+                            visitor stopped speaking
+    :param min_duration: Minimum time to record when stopping on silence.
+                         Default is `REC_MIN_DURATION`
+    :param trailing_silence: Time of silence which stops the recording.
+                             Default is `REC_TRAILING_SILENCE`
     """
-    myrecording = sd.rec(int(duration * AUDIO_REC_SR),
-                         samplerate=AUDIO_REC_SR,
-                         channels=2)
-    sd.wait()  # Wait until recording is finished
-    writewav(str(filename), AUDIO_REC_SR, myrecording)
+    samplerate = samplerate or AUDIO_REC_SR
+    channels = channels or AUDIO_REC_CHANNELS
+    if min_duration is None:
+        min_duration = REC_MIN_DURATION
+    if trailing_silence is None:
+        trailing_silence = REC_TRAILING_SILENCE
+    format, subtype = recording_format(str(filename), format, subtype,
+                                       AUDIO_REC_SUBTYPE)
+    extension = '.' + format.lower()
+    if not str(filename).lower().endswith(extension):
+        logger.warning(f'recording {format} to {filename}, changing the '
+                       f'extension to {extension}')
+        if isinstance(filename, FileHandle):
+            # Storyboards share the handle, so later uses find the file
+            filename.name = os.path.splitext(filename.name)[0] + extension
+        else:
+            filename = os.path.splitext(str(filename))[0] + extension
+    # At most 32 bit per sample
+    path = hal.artifacts.stage(
+        filename, size=int(duration * samplerate * channels * 4))
+    recorder = Recorder(path,
+                        samplerate=samplerate,
+                        channels=channels,
+                        format=format,
+                        subtype=subtype,
+                        keep=cache,
+                        silence_threshold=(REC_SILENCE_RMS if stop_on_silence
+                                           else None),
+                        trailing_silence=trailing_silence,
+                        min_duration=min_duration,
+                        ring=hal.input_ring,
+                        preroll=REC_PREROLL)
+    try:
+        recorded = recorder.record(duration)
+    finally:
+        disarm_input(hal)
+    try:
+        nbytes = os.path.getsize(path)
+    except OSError:
+        nbytes = 0
+    hal.recorded_bytes += nbytes
+    logger.info(f'recorded {recorded:.1f}s, {nbytes / 1024:.0f} KiB to '
+                f'{filename} (stopped by {recorder.stopped_by}), '
+                f'{hal.recorded_bytes / 2**20:.1f} MiB this session')
+    hal.session['recordings'][os.path.basename(str(filename))] = {
+        'duration': recorded,
+        'max_duration': duration,
+        'stopped_by': recorder.stopped_by,
+        'bytes': nbytes
+    }
+    save_session(hal)
+    if nbytes:
+        hal.artifacts.commit(
+            filename, on_flushed=lambda: hal.postproc.submit('audio',
+                                                             filename))
+    else:
+        hal.artifacts.discard(filename)
     if cache:
-        hal.soundcache[str(filename)] = (myrecording, AUDIO_REC_SR)
+        hal.soundcache.put(filename, recorder.data, samplerate)
 
 
-@blocking
+def arm_input(hal: PizzaHAL, samplerate: int = None, channels: int = None,
+              **kwargs):
+    """
+    Open the microphone ahead of a recording and keep the last `REC_RING`
+    seconds of input buffered, but at least `REC_PREROLL`
+
+    :param hal: The hardware abstraction object
+    :param samplerate: Default is `AUDIO_REC_SR`
+    :param channels: Default is `AUDIO_REC_CHANNELS`
+    """
+    samplerate = samplerate or AUDIO_REC_SR
+    channels = channels or AUDIO_REC_CHANNELS
+    ring = hal.input_ring
+    if ring is not None:
+        if ring.samplerate == samplerate and ring.channels == channels:
+            return
+        ring.stop()
+    hal.input_ring = InputRing(samplerate=samplerate, channels=channels,
+                               seconds=max(REC_RING, REC_PREROLL))
+    hal.input_ring.start()
+
+
+def disarm_input(hal: PizzaHAL):
+    """
+    Close the microphone opened by `arm_input`
+
+    :param hal: The hardware abstraction object
+    """
+    if hal.input_ring is not None:
+        hal.input_ring.stop()
+        hal.input_ring = None
+
+
+def save_session(hal: PizzaHAL):
+    """
+    Write the session metadata to the session folder
+
+    :param hal: The hardware abstraction object
+    """
+    try:
+        with open(hal.artifacts.stage(REC_SESSION), 'w') as f:
+            json.dump(hal.session, f, indent=2)
+    except OSError:
+        logger.exception('could not write session metadata')
+        return
+    hal.artifacts.commit(REC_SESSION)
+
+
+@blocking(device='camera')
 def record_video(hal: PizzaHAL, filename: Any, duration: float, **kwargs):
     """
-    Record video using the camera
+    Record video using the camera. If the camera was armed with
+    `arm_camera`, the video starts with the buffered pre-roll.
 
     :param hal: The hardware abstraction object
     :param filename: The path of the file to record to
     :param duration: The time to record in seconds
     """
-    hal.camera.resolution = VIDEO_RES
-    hal.camera.start_recording(str(filename))
-    hal.camera.wait_recording(duration)
-    hal.camera.stop_recording()
+    # Exposure is locked, let the lights reach their targets first
+    hal.lights.wait()
+    staged = hal.artifacts.stage(
+        filename, size=int(duration * VIDEO_BITRATE / 8))
+    parts = hal.camera.record(staged, duration)
+    # Parts after the first are named like it, with a suffix
+    targets = [str(filename) + part[len(staged):] for part in parts]
+    for target in targets[:-1]:
+        hal.artifacts.commit(target)
+    if hal.camera.camera.encoded:
+        # Artifacts are flushed in order, so all parts are there for the mux
+        hal.artifacts.commit(
+            targets[-1],
+            on_flushed=lambda: hal.postproc.submit(
+                'video', filename, fps=hal.camera.framerate))
+    else:
+        # Raw frames can not be muxed
+        hal.artifacts.commit(targets[-1])
 
 
-@blocking
-def take_photo(hal: PizzaHAL, filename: Any, **kwargs):
+def postprocess_recovered(hal: PizzaHAL, path: str):
+    """
+    Queue the post-processing job of an artifact recovered from a previous
+    run
+
+    :param hal: The hardware abstraction object
+    :param path: The path of the artifact
+    """
+    job = job_for(path)
+    if job is not None:
+        hal.postproc.submit(job, path)
+
+
+def arm_camera(hal: PizzaHAL, preroll: float, **kwargs):
+    """
+    Keep the last `preroll` seconds of video in memory for the next
+    `record_video`
+
+    :param hal: The hardware abstraction object
+    :param preroll: Seconds of video to buffer
+    """
+    if hal.camera is not None and preroll > 0.:
+        hal.camera.arm(preroll)
+
+
+@blocking(device='camera')
+def take_photo(hal: PizzaHAL, filename: Any, video_port: bool = False,
+               **kwargs):
     """
-    Take a foto with the camera
+    Take a foto with the camera. The foto is saved in the background.
 
     :param hal: The hardware abstraction object
     :param filename: The path of the filename for the foto
+    :param video_port: `True` for a near instant shutter with lower quality
     """
-    hal.camera.resolution = PHOTO_RES
-    hal.camera.capture(str(filename))
+    # Exposure is locked, let the lights reach their targets first
+    hal.lights.wait()
+    hal.camera.capture(hal.artifacts.stage(filename), video_port=video_port,
+                       on_saved=lambda: hal.artifacts.commit(filename))
 
 
 @blocking
@@ -394,16 +994,44 @@ def init_sounds(hal: PizzaHAL, sounds: List):
     :param hal:
     :param sounds: A list of sound files
     """
-    if hal.soundcache is None:
-        hal.soundcache = {}
-
     for sound in sounds:
-        # Extract data and sampling rate from file
-        data, fs = sf.read(str(sound), dtype='float32')
-        hal.soundcache[str(sound)] = (data, fs)
+        hal.soundcache.load(sound)
+    logger.debug(f'init_sounds: {hal.soundcache.stats()}')
 
 
-@blocking
-def init_camera(hal: PizzaHAL):
+def preload_sounds(hal: PizzaHAL, sounds: List, workers: int = 4):
+    """
+    Load sounds into memory in the background
+
+    :param hal: The hardware abstraction object
+    :param sounds: A list of sound files
+    :param workers: Number of decoding threads
+    :return: the running `Preloader`
+    """
+    return Preloader(hal.soundcache, sounds, workers=workers).start()
+
+
+@blocking(device='audio_out')
+def init_audio(hal: PizzaHAL):
+    """
+    Open the audio output stream for the session
+
+    :param hal: The hardware abstraction object
+    """
+    hal.audio.start()
+
+
+@blocking(device='camera')
+def init_camera(hal: PizzaHAL, backend: str = CAMERA_BACKEND, **options):
+    """
+    Open the camera and let it warm up in photo mode
+
+    :param hal: The hardware abstraction object
+    :param backend: The name of the camera backend, see `camera.BACKENDS`
+    :param options: Passed to the backend, e.g. `framerate` and `max_size`
+                    of the fake camera
+    """
     if hal.camera is None:
-        hal.camera = PiCamera()
+        hal.camera = CameraManager(CAMERA_BACKENDS[backend](**options),
+                                   PHOTO_RES, VIDEO_RES)
+        hal.camera.warm_up()
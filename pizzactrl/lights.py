@@ -0,0 +1,258 @@
+import logging
+import threading
+from time import monotonic
+
+from typing import Any, Dict
+
+import numpy as np
+
+from . import curves
+
+
+logger = logging.getLogger(__name__)
+
+
+TICK_RATE = 100     # Output updates per second while animations run
+
+
+class Animation:
+    """
+    A curve played on one output of an `Animator`
+    """
+    def __init__(self, output: str, curve: Any, duration: float,
+                 repeat: bool = False):
+        """
+        :param output: The name of the output
+        :param curve: The values of the output over `duration`
+        :param duration: The length of the animation in seconds
+        :param repeat: `True` to loop the curve until interrupted
+        """
+        self.output = output
+        self.curve = curve
+        self.duration = duration
+        self.repeat = repeat
+        self.start = monotonic()
+        self.interrupted = False
+        # Set when the animation reached its end or was interrupted
+        self.done = threading.Event()
+
+    def at(self, now: float):
+        """
+        :param now: A `monotonic` timestamp
+        :return: a tuple of the output value at `now` and `True` if the
+                 animation is over
+        """
+        elapsed = now - self.start
+        if self.repeat:
+            i = int(elapsed / self.duration * len(self.curve))
+            return self.curve[i % len(self.curve)], False
+        if elapsed >= self.duration:
+            return self.curve[-1], True
+        return self.curve[int(elapsed / self.duration *
+                              (len(self.curve) - 1))], False
+
+    def wait(self, timeout: float = None):
+        """
+        Wait until the animation is over
+
+        :param timeout: float
+                    Default `None`, maximum time in seconds to wait
+        :return: `True` if the animation is over
+        """
+        return self.done.wait(timeout)
+
+
+class Animator:
+    """
+    Owns the PWM outputs of the lights and animates them on a thread of its
+    own, so changing the lights never blocks the caller.
+
+    Animations are sampled from precomputed curves (see `curves`) at a
+    fixed tick rate. Fades are written into a buffer kept per output, so a
+    running animation allocates nothing. A new target for an output
+    interrupts the animation running on it and starts from the current
+    value. The thread sleeps while no animation runs.
+    """
+    def __init__(self, outputs: Dict[str, Any], tick_rate: int = TICK_RATE):
+        """
+        :param outputs: The PWM outputs by name
+        :param tick_rate: Updates per second while animations run
+        """
+        self.outputs = outputs
+        self.tick_rate = tick_rate
+        self._animations = {}
+        self._buffers = {}
+        self._cond = threading.Condition()
+        self._running = True
+        self.animations = 0
+        self.interrupted = 0
+        self.ticks = 0
+        self.late_ticks = 0
+        self.max_lag = 0.
+        self._thread = threading.Thread(target=self._run, name='lights',
+                                        daemon=True)
+        self._thread.start()
+
+    def fade(self, output: str, target: float, duration: float = 0.,
+             steps: int = None, shape: str = 'gamma'):
+        """
+        Fade an output from its current value to `target`
+
+        :param output: The name of the output
+        :param target: The value to fade to [0.0 .. 1.0]
+        :param duration: The length of the fade in seconds, 0 to set the
+                         value at once
+        :param steps: The number of steps of the fade, `None` for one step
+                      per tick
+        :param shape: One of `curves.SHAPES`
+        :return: the `Animation`
+        """
+        if steps is None:
+            steps = max(1, int(duration * self.tick_rate))
+        with self._cond:
+            if duration <= 0.:
+                return self._set(output, target)
+            buffer = self._buffers.get(output, None)
+            if buffer is None or len(buffer) < steps + 1:
+                buffer = self._buffers[output] = np.empty(steps + 1)
+            # The interrupted animation is done with the buffer
+            self._interrupt(output)
+            curve = curves.fade(shape, steps, self.outputs[output].value,
+                                target, out=buffer)
+            return self._start(Animation(output, curve, duration))
+
+    def blink(self, output: str, on_time: float = 1., off_time: float = 1.,
+              fade_in_time: float = 0., fade_out_time: float = 0.,
+              shape: str = 'gamma'):
+        """
+        Blink an output until it gets a new target
+
+        :param output: The name of the output
+        :param on_time: Seconds at full brightness
+        :param off_time: Seconds off
+        :param fade_in_time: Seconds to fade in
+        :param fade_out_time: Seconds to fade out
+        :param shape: One of `curves.SHAPES`, used for fading in and out
+        :return: the `Animation`
+        """
+        curve = curves.blink(shape, self.tick_rate, on_time, off_time,
+                             fade_in_time, fade_out_time)
+        duration = fade_in_time + on_time + fade_out_time + off_time
+        with self._cond:
+            if len(curve) == 0 or duration <= 0.:
+                return self._set(output, 1.)
+            return self._start(Animation(output, curve, duration,
+                                         repeat=True))
+
+    def set(self, output: str, value: float):
+        """
+        Set an output at once, interrupting its animation
+
+        :param output: The name of the output
+        :param value: The value [0.0 .. 1.0]
+        :return: the finished `Animation`
+        """
+        with self._cond:
+            return self._set(output, value)
+
+    def off(self):
+        """
+        Stop all animations and turn all outputs off
+        """
+        with self._cond:
+            for output in self.outputs:
+                self._set(output, 0.)
+
+    def wait(self, timeout: float = None):
+        """
+        Wait until all animations which do not repeat are over
+
+        :param timeout: float
+                    Default `None`, maximum time in seconds to wait
+        :return: `True` if the animations are over
+        """
+        with self._cond:
+            pending = [a for a in self._animations.values() if not a.repeat]
+        deadline = None if timeout is None else monotonic() + timeout
+        for animation in pending:
+            remaining = None if deadline is None else \
+                max(0., deadline - monotonic())
+            if not animation.wait(remaining):
+                return False
+        return True
+
+    def close(self):
+        """
+        Stop the animation thread
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join()
+
+    def _set(self, output: str, value: float):
+        """
+        Must be called with the lock held
+        """
+        self._interrupt(output)
+        self.outputs[output].value = value
+        animation = Animation(output, np.array([value]), 0.)
+        animation.done.set()
+        return animation
+
+    def _start(self, animation: Animation):
+        """
+        Must be called with the lock held
+        """
+        self._interrupt(animation.output)
+        self._animations[animation.output] = animation
+        self.animations += 1
+        self._cond.notify()
+        return animation
+
+    def _interrupt(self, output: str):
+        current = self._animations.pop(output, None)
+        if current is not None:
+            current.interrupted = True
+            current.done.set()
+            self.interrupted += 1
+
+    def _run(self):
+        tick = 1. / self.tick_rate
+        next_tick = monotonic()
+        with self._cond:
+            while self._running:
+                if not self._animations:
+                    self._cond.wait()
+                    next_tick = monotonic()
+                    continue
+                now = monotonic()
+                for output, animation in list(self._animations.items()):
+                    value, over = animation.at(now)
+                    self.outputs[output].value = value
+                    if over:
+                        del self._animations[output]
+                        animation.done.set()
+                if now >= next_tick:
+                    # Woken up by the tick, not by a new animation
+                    self.ticks += 1
+                    self.max_lag = max(self.max_lag, now - next_tick)
+                    next_tick += tick
+                    if next_tick <= now:
+                        self.late_ticks += 1
+                        next_tick = now + tick
+                self._cond.wait(max(0., next_tick - monotonic()))
+
+    def stats(self):
+        """
+        :return: a dict with the animation and tick counters and the maximum
+                 lag of a tick in seconds
+        """
+        with self._cond:
+            return {
+                'animations': self.animations,
+                'interrupted': self.interrupted,
+                'ticks': self.ticks,
+                'late_ticks': self.late_ticks,
+                'max_lag': self.max_lag
+            }
@@ -13,7 +13,17 @@ logger = logging.getLogger('pizzactrl.main')
 @click.option('--move', is_flag=True)
 @click.option('--test', is_flag=True, default=False)
 @click.option('--debug', is_flag=True, default=False)
-def main(move: bool=False, test: bool=False, debug: bool=False):
+@click.option('--hold-time', help='Time to hold the start button', type=float,
+              default=3.0)
+@click.option('--camera', help='Camera backend',
+              type=click.Choice(['picamera', 'fake']), default='picamera')
+@click.option('--fake-framerate', help='Framerate of the fake camera',
+              type=int, default=5)
+@click.option('--fake-size', help='Maximum frame size of the fake camera',
+              type=(int, int), default=(640, 480))
+def main(move: bool=False, test: bool=False, debug: bool=False,
+         hold_time: float=3.0, camera: str='picamera',
+         fake_framerate: int=5, fake_size: tuple=(640, 480)):
     if debug or test:
         logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
     else:
@@ -21,7 +31,12 @@ def main(move: bool=False, test: bool=False, debug: bool=False):
 
     sm = Statemachine(story_de=sb_de.STORYBOARD,
                       story_en=sb_en.STORYBOARD,
-                      move=move)
+                      move=move,
+                      hold_time=hold_time,
+                      camera=camera,
+                      camera_options=({'framerate': fake_framerate,
+                                       'max_size': fake_size}
+                                      if camera == 'fake' else None))
     sm.test = test
 
     exitcode = 0
@@ -40,10 +55,38 @@ def main(move: bool=False, test: bool=False, debug: bool=False):
 @click.command()
 @click.option('--time', help='Safety deactivation time', type=float,
               default=13.2)
-def rewind(time: float):
+@click.option('--speed', help='Motor speed', type=float, default=0.3)
+def rewind(time: float, speed: float):
     from . import hal
     pizza = hal.PizzaHAL()
-    hal.rewind(pizza.motor_ud, pizza.ud_sensor, max_time=time)
+    # The position is unknown, so the whole rewind runs at the slow speed
+    move_end, elapsed = hal.rewind(pizza.motor_ud, pizza.ud_sensor,
+                                   max_time=time, slow_speed=speed)
+    click.echo(f'rewind ended by {move_end.name} after {elapsed:.1f}s')
+    hal.turn_off(pizza)
+    del pizza
+
+
+@click.command()
+@click.option('--speed', help='Motor speed', type=float, default=0.3)
+@click.option('--time', help='Safety deactivation time', type=float,
+              default=60.)
+def calibrate(speed: float, time: float):
+    from . import hal
+    from .fs_names import FRAME_INDEX
+    pizza = hal.PizzaHAL()
+    hal.rewind(pizza.motor_ud, pizza.ud_sensor)
+    if not pizza.ud_sensor.is_home:
+        click.echo('scroll is not at home, not calibrating')
+    else:
+        index = hal.calibrate(pizza.motor_ud, pizza.ud_sensor, speed=speed,
+                              max_time=time)
+        if index is None:
+            click.echo('end of tape not reached, index not written')
+        else:
+            index.save(FRAME_INDEX)
+            click.echo(f'{len(index)} frames written to {FRAME_INDEX}')
+        hal.rewind(pizza.motor_ud, pizza.ud_sensor)
     hal.turn_off(pizza)
     del pizza
 
@@ -0,0 +1,200 @@
+import os
+import json
+import logging
+import threading
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from time import monotonic
+
+from typing import Any
+
+import numpy as np
+import soundfile as sf
+
+
+logger = logging.getLogger(__name__)
+
+
+MANIFEST = 'postproc.json'
+
+TRIM_THRESHOLD = 0.01     # RMS level below which audio counts as silence
+TRIM_WINDOW = 0.01        # Length of the RMS windows in seconds
+TRIM_MARGIN = 0.2         # Silence kept before and after the sound
+TARGET_RMS = 0.1          # Loudness of normalized recordings
+MAX_PEAK = 0.99           # Maximum sample value after normalization
+VIDEO_FPS = 15            # Framerate of the raw h264 streams
+TAIL_SUFFIX = '.tail'     # Continuation of a video after its pre-roll
+
+
+def _lower_priority(niceness: int):
+    os.nice(niceness)
+
+
+def _replace(path: str, write: Any):
+    """
+    Write a file through a temporary file, then move it into place
+    """
+    base, ext = os.path.splitext(path)
+    tmp = base + '.tmp' + ext
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def process_audio(path: str, threshold: float = TRIM_THRESHOLD,
+                  target_rms: float = TARGET_RMS):
+    """
+    Trim leading and trailing silence of a recording and normalize its
+    loudness. The file is replaced, keeping its format.
+
+    :param path: The path of the recording
+    :param threshold: RMS level below which audio counts as silence
+    :param target_rms: The RMS level to normalize to
+    :return: a dict describing the result
+    """
+    info = sf.info(path)
+    data, fs = sf.read(path, dtype='float32', always_2d=True)
+    window = max(1, int(TRIM_WINDOW * fs))
+    n = len(data) // window
+    if n == 0:
+        return {'trimmed': 0., 'gain': 1.}
+
+    # RMS over all channels of each window
+    rms = np.sqrt(np.mean(np.square(data[:n * window]).reshape(n, -1),
+                          axis=1))
+    loud = np.flatnonzero(rms >= threshold)
+    if len(loud) == 0:
+        return {'trimmed': 0., 'gain': 1., 'silent': True}
+    margin = int(TRIM_MARGIN * fs)
+    start = max(0, loud[0] * window - margin)
+    end = min(len(data), (loud[-1] + 1) * window + margin)
+    data = data[start:end]
+
+    level = float(np.sqrt(np.mean(np.square(data))))
+    peak = float(np.max(np.abs(data)))
+    gain = min(target_rms / level, MAX_PEAK / peak) if level > 0. else 1.
+    data *= gain
+
+    _replace(path, lambda tmp: sf.write(tmp, data, fs, format=info.format,
+                                        subtype=info.subtype))
+    return {'trimmed': (info.frames - len(data)) / fs, 'gain': gain}
+
+
+def mux_video(path: str, fps: int = VIDEO_FPS):
+    """
+    Put a raw h264 stream into an mp4 container next to it. A video
+    recorded after a pre-roll continues in `<path>.tail`, both parts are
+    joined.
+
+    :param path: The path of the .h264 file
+    :param fps: The framerate of the stream
+    :return: a dict describing the result
+    """
+    target = os.path.splitext(path)[0] + '.mp4'
+    source = path
+    tail = path + TAIL_SUFFIX
+    if os.path.exists(tail):
+        # h264 streams can be joined by concatenation
+        source = f'concat:{path}|{tail}'
+    _replace(target, lambda tmp: subprocess.run(
+        ['ffmpeg', '-y', '-loglevel', 'error', '-framerate', str(fps),
+         '-i', source, '-c', 'copy', tmp], check=True))
+    return {'output': target, 'parts': 2 if source != path else 1}
+
+
+JOBS = {
+    'audio': process_audio,
+    'video': mux_video
+}
+
+
+def job_for(path: str):
+    """
+    :param path: The path of an artifact
+    :return: the name of the job for the artifact in `JOBS`, or `None`
+    """
+    extension = os.path.splitext(path)[1][1:].upper()
+    if extension == 'H264':
+        return 'video'
+    if extension in sf.available_formats():
+        return 'audio'
+    return None
+
+
+class Pipeline:
+    """
+    Post-processes session artifacts in background processes at low
+    priority, so the storyboard never waits for it.
+
+    Every session folder gets a manifest with the status of its jobs.
+    """
+    def __init__(self, workers: int = 1, niceness: int = 10):
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_lower_priority,
+            initargs=(niceness,))
+        self._lock = threading.Lock()
+        self._manifests = {}
+        self._pending = 0
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def submit(self, job: str, filename: Any, **kwargs):
+        """
+        Queue a job for a session artifact
+
+        :param job: One of `JOBS`
+        :param filename: The path of the artifact
+        """
+        path = str(filename)
+        self._update(path, job, write=False, status='queued')
+        with self._lock:
+            self._pending += 1
+        start = monotonic()
+        future = self._executor.submit(JOBS[job], path, **kwargs)
+        future.add_done_callback(
+            lambda f: self._done(f, path, job, start))
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop accepting jobs
+
+        :param wait: `True` to wait until all queued jobs are done
+        """
+        self._executor.shutdown(wait=wait)
+
+    def _done(self, future: Any, path: str, job: str, start: float):
+        with self._lock:
+            self._pending -= 1
+        elapsed = monotonic() - start
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f'{job} job for {path} failed: {e!r}')
+            self._update(path, job, status='failed', error=repr(e),
+                         elapsed=elapsed)
+            return
+        logger.debug(f'{job} job for {path} done in {elapsed:.1f}s')
+        self._update(path, job, status='done', elapsed=elapsed, **result)
+
+    def _update(self, path: str, job: str, write: bool = True, **status):
+        """
+        Record the status of a job in the manifest of its session folder
+
+        :param write: `False` to only update the manifest in memory, it is
+                      written with the next update from a worker callback
+        """
+        manifest = os.path.join(os.path.dirname(path), MANIFEST)
+        with self._lock:
+            jobs = self._manifests.setdefault(manifest, {})
+            jobs[f'{os.path.basename(path)}:{job}'] = status
+            if not write:
+                return
+            try:
+                with open(manifest, 'w') as f:
+                    json.dump(jobs, f, indent=2)
+            except OSError:
+                logger.exception(f'could not write {manifest}')
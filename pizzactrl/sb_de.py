@@ -14,10 +14,11 @@ STORYBOARD = [
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 2
     ),
     storyboard.Chapter(     # X3
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,   # Bild 1
-                      intensity=1.0, fade=1.0),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('04de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,   # Bild 1
+                          intensity=1.0, fade=1.0),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('04de'))),
         storyboard.Do(storyboard.Activity.ADVANCE_UP),  # Bild 3
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('05de')),
@@ -98,74 +99,83 @@ STORYBOARD = [
     storyboard.Chapter(     # X8
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('18de')),
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1.0, fade=2.0),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('19de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1.0, fade=2.0),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('19de'))),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('20de')),
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=0., fade=2.0),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('21de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=0., fade=2.0),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('21de'))),
         storyboard.Do(storyboard.Activity.WAIT_FOR_INPUT),
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 9
     ),
     storyboard.Chapter(     # X9
-        storyboard.Do(storyboard.Activity.LIGHT_LAYER,
-                      intensity=1., fade=0.5),
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=0.5),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('22de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_LAYER,
+                          intensity=1., fade=0.5),
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=0.5),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('22de'))),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('23de')),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('24de')),
-        storyboard.Do(storyboard.Activity.LIGHT_LAYER,
-                      intensity=0., fade=1.),
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=0., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('25de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_LAYER,
+                          intensity=0., fade=1.),
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=0., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('25de'))),
         storyboard.Do(storyboard.Activity.WAIT_FOR_INPUT),
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 10
     ),
     storyboard.Chapter(     # X10
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('26de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('26de'))),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('27de')),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('28de')),
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=0., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('29de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=0., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('29de'))),
         storyboard.Do(storyboard.Activity.WAIT_FOR_INPUT),
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 11
     ),
     storyboard.Chapter(     # X11
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('30de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('30de'))),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('31de')),
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=0., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('32de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=0., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('32de'))),
         storyboard.Do(storyboard.Activity.WAIT_FOR_INPUT),
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 12
     ),
     storyboard.Chapter(     # X12
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=.5),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('33de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=.5),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('33de'))),
         storyboard.Do(storyboard.Activity.WAIT_FOR_INPUT),
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 13
     ),
@@ -185,10 +195,11 @@ STORYBOARD = [
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 14
     ),
     storyboard.Chapter(     # X14
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('35de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('35de'))),
         storyboard.Do(storyboard.Activity.WAIT_FOR_INPUT),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.SFX_REC_AUDIO),
@@ -217,10 +228,11 @@ STORYBOARD = [
     storyboard.Chapter(     # X16
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('37de')),
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('38de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('38de'))),
         storyboard.Do(storyboard.Activity.ADVANCE_UP)  # Bild 17
     ),
     storyboard.Chapter(     # X17
@@ -233,7 +245,8 @@ STORYBOARD = [
                       sound=fs_names.SFX_REC_AUDIO),
         storyboard.Do(storyboard.Activity.RECORD_VIDEO,
                       filename=fs_names.REC_DRAW_CITY,
-                      duration=60.0),
+                      duration=60.0,
+                      preroll=5.0),
         storyboard.Do(storyboard.Activity.TAKE_PHOTO,
                       filename=fs_names.REC_CITY_PHOTO),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
@@ -242,10 +255,11 @@ STORYBOARD = [
         storyboard.Do(storyboard.Activity.ADVANCE_UP)  # Bild 18
     ),
     storyboard.Chapter(     # X18
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('40de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('40de'))),
         storyboard.Do(storyboard.Activity.ADVANCE_UP),  # Bild 19
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('41de')),
@@ -26,10 +26,11 @@ STORYBOARD = [
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 12
     ),
     storyboard.Chapter(     # X12
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=.5),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('33de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=.5),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('33de'))),
         storyboard.Do(storyboard.Activity.WAIT_FOR_INPUT),
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 13
     ),
@@ -49,10 +50,11 @@ STORYBOARD = [
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 14
     ),
     storyboard.Chapter(     # X14
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('35de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('35de'))),
         storyboard.Do(storyboard.Activity.WAIT_FOR_INPUT),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.SFX_REC_AUDIO),
@@ -81,10 +83,11 @@ STORYBOARD = [
     storyboard.Chapter(     # X16
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('37de')),
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('38de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('38de'))),
         storyboard.Do(storyboard.Activity.ADVANCE_UP)  # Bild 17
     ),
     storyboard.Chapter(     # X17
@@ -97,7 +100,8 @@ STORYBOARD = [
                       sound=fs_names.SFX_REC_AUDIO),
         storyboard.Do(storyboard.Activity.RECORD_VIDEO,
                       filename=fs_names.REC_DRAW_CITY,
-                      duration=60.0),
+                      duration=60.0,
+                      preroll=5.0),
         storyboard.Do(storyboard.Activity.TAKE_PHOTO,
                       filename=fs_names.REC_CITY_PHOTO),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
@@ -106,10 +110,11 @@ STORYBOARD = [
         storyboard.Do(storyboard.Activity.ADVANCE_UP)  # Bild 18
     ),
     storyboard.Chapter(     # X18
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('40de')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('40de'))),
         storyboard.Do(storyboard.Activity.ADVANCE_UP),  # Bild 19
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('41de')),
@@ -228,7 +228,8 @@ STORYBOARD = [
                       sound=fs_names.SFX_REC_AUDIO),
         storyboard.Do(storyboard.Activity.RECORD_VIDEO,
                       filename=fs_names.REC_DRAW_CITY,
-                      duration=60.0),
+                      duration=60.0,
+                      preroll=5.0),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.SFX_STOP_REC),
 
@@ -13,10 +13,11 @@ STORYBOARD = [
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 2
     ),
     storyboard.Chapter(
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,   # Bild 1
-                      intensity=1.0, fade=1.0),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('04en')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,   # Bild 1
+                          intensity=1.0, fade=1.0),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('04en'))),
         storyboard.Do(storyboard.Activity.ADVANCE_UP),  # Bild 3
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('05en')),
@@ -97,74 +98,83 @@ STORYBOARD = [
     storyboard.Chapter(
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('18en')),
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1.0, fade=2.0),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('19en')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1.0, fade=2.0),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('19en'))),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('20en')),
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=0., fade=2.0),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('21en')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=0., fade=2.0),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('21en'))),
         storyboard.Do(storyboard.Activity.WAIT_FOR_INPUT),
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 9
     ),
     storyboard.Chapter(
-        storyboard.Do(storyboard.Activity.LIGHT_LAYER,
-                      intensity=1., fade=0.5),
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=0.5),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('22en')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_LAYER,
+                          intensity=1., fade=0.5),
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=0.5),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('22en'))),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('23en')),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('24en')),
-        storyboard.Do(storyboard.Activity.LIGHT_LAYER,
-                      intensity=0., fade=1.),
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=0., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('25en')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_LAYER,
+                          intensity=0., fade=1.),
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=0., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('25en'))),
         storyboard.Do(storyboard.Activity.WAIT_FOR_INPUT),
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 10
     ),
     storyboard.Chapter(
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('26en')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('26en'))),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('27en')),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('28en')),
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=0., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('29en')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=0., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('29en'))),
         storyboard.Do(storyboard.Activity.WAIT_FOR_INPUT),
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 11
     ),
     storyboard.Chapter(
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('30en')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('30en'))),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('31en')),
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=0., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('32en')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=0., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('32en'))),
         storyboard.Do(storyboard.Activity.WAIT_FOR_INPUT),
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 12
     ),
     storyboard.Chapter(
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=.5),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('33en')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=.5),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('33en'))),
         storyboard.Do(storyboard.Activity.WAIT_FOR_INPUT),
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 13
     ),
@@ -184,10 +194,11 @@ STORYBOARD = [
         storyboard.Do(storyboard.Activity.ADVANCE_UP)   # Bild 14
     ),
     storyboard.Chapter(
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('35en')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('35en'))),
         storyboard.Do(storyboard.Activity.WAIT_FOR_INPUT),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.SFX_REC_AUDIO),
@@ -216,10 +227,11 @@ STORYBOARD = [
     storyboard.Chapter(
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('37en')),
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('38en')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('38en'))),
         storyboard.Do(storyboard.Activity.ADVANCE_UP)  # Bild 17
     ),
     storyboard.Chapter(
@@ -232,7 +244,8 @@ STORYBOARD = [
                       sound=fs_names.SFX_REC_AUDIO),
         storyboard.Do(storyboard.Activity.RECORD_VIDEO,
                       filename=fs_names.REC_DRAW_CITY,
-                      duration=60.0),
+                      duration=60.0,
+                      preroll=5.0),
         storyboard.Do(storyboard.Activity.TAKE_PHOTO,
                       filename=fs_names.REC_CITY_PHOTO),
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
@@ -241,10 +254,11 @@ STORYBOARD = [
         storyboard.Do(storyboard.Activity.ADVANCE_UP)  # Bild 18
     ),
     storyboard.Chapter(
-        storyboard.Do(storyboard.Activity.LIGHT_BACK,
-                      intensity=1., fade=1.),
-        storyboard.Do(storyboard.Activity.PLAY_SOUND,
-                      sound=fs_names.StoryFile('40en')),
+        storyboard.Parallel(
+            storyboard.Do(storyboard.Activity.LIGHT_BACK,
+                          intensity=1., fade=1.),
+            storyboard.Do(storyboard.Activity.PLAY_SOUND,
+                          sound=fs_names.StoryFile('40en'))),
         storyboard.Do(storyboard.Activity.ADVANCE_UP),  # Bild 19
         storyboard.Do(storyboard.Activity.PLAY_SOUND,
                       sound=fs_names.StoryFile('41en')),
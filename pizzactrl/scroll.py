@@ -0,0 +1,93 @@
+import os
+import json
+import logging
+
+from typing import List
+
+
+logger = logging.getLogger(__name__)
+
+
+class FrameIndex:
+    """
+    Positions of the frames of a scroll in sensor counts from home, measured
+    by `pizza-calibrate`.
+
+    Every frame is a dict with its `position` and the `time` in seconds it
+    took to reach it from home at the calibration `speed`.
+    """
+    def __init__(self, frames: List[dict], end: int, duration: float,
+                 speed: float):
+        """
+        :param frames: The frames in order, starting with home
+        :param end: The position of the end of the tape
+        :param duration: Seconds from home to the end of the tape
+        :param speed: The motor speed of the calibration run
+        """
+        self.frames = frames
+        self.end = end
+        self.duration = duration
+        self.speed = speed
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def counts_per_second(self):
+        """
+        :return: the counts moved per second at the calibration speed
+        """
+        return self.end / self.duration if self.duration > 0. else 0.
+
+    def position(self, frame: int):
+        """
+        :param frame: The number of the frame, 0 is home
+        :return: the position of the frame in sensor counts
+        """
+        return self.frames[frame]['position']
+
+    def nearest(self, position: int):
+        """
+        :param position: A position in sensor counts
+        :return: the number of the frame closest to `position`
+        """
+        return min(range(len(self.frames)),
+                   key=lambda i: abs(self.frames[i]['position'] - position))
+
+    def eta(self, distance: int, speed: float):
+        """
+        :param distance: A distance in sensor counts
+        :param speed: The motor speed
+        :return: the expected time in seconds to move `distance`
+        """
+        cps = self.counts_per_second * abs(speed) / self.speed
+        return abs(distance) / cps if cps > 0. else 0.
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        :param path: The path of the index file
+        :return: the `FrameIndex`, or `None` if the scroll is not calibrated
+        """
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            logger.info(f'no frame index at {path}, scroll not calibrated')
+            return None
+        except (OSError, ValueError):
+            logger.exception(f'could not read frame index {path}')
+            return None
+        return cls(**data)
+
+    def save(self, path: str):
+        """
+        :param path: The path of the index file
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'frames': self.frames, 'end': self.end,
+                       'duration': self.duration, 'speed': self.speed},
+                      f, indent=2)
+        os.replace(tmp, path)
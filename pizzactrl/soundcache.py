@@ -0,0 +1,439 @@
+import os
+import glob
+import hashlib
+import tempfile
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from time import monotonic
+
+from typing import Any, Callable, List
+
+import numpy as np
+import soundfile as sf
+
+from .audio import resample
+from .fs_names import FileType
+
+
+logger = logging.getLogger(__name__)
+
+
+PCM_SCALE = 32768   # Full scale of 16 bit samples, as used by soundfile
+
+
+def _to_pcm(data: Any):
+    """
+    :param data: Sample data of any dtype
+    :return: the data as 16 bit integer samples
+    """
+    if data.dtype == np.int16:
+        return data
+    if data.dtype.kind == 'i':
+        shift = data.dtype.itemsize * 8 - 16
+        return (data >> shift).astype(np.int16)
+    return np.clip(np.round(data * PCM_SCALE),
+                   -PCM_SCALE, PCM_SCALE - 1).astype(np.int16)
+
+
+def _from_pcm(pcm: Any, dtype: str):
+    """
+    :param pcm: 16 bit integer samples
+    :param dtype: The dtype to convert to
+    :return: the samples scaled like `soundfile` reads them as `dtype`
+    """
+    dtype = np.dtype(dtype)
+    if dtype == np.int16:
+        return pcm
+    if dtype.kind == 'i':
+        return pcm.astype(dtype) << (dtype.itemsize * 8 - 16)
+    data = pcm.astype(dtype)
+    data /= PCM_SCALE
+    return data
+
+
+class PCMStore:
+    """
+    Persistent cache of decoded audio on disk.
+
+    Every source file is decoded once and saved as a `.npy` file, keyed by
+    its path, modification time and size. Samples are stored as 16 bit
+    integers like the sources, so the store takes no more space on the SD
+    card than the sources and reading it is no slower. Later loads read
+    the `.npy` file into memory and convert it without decoding. The data
+    is not memory mapped, so playback never waits for pages to be read
+    from the SD card.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _names(self, source: str, tag: str):
+        """
+        :return: the file name prefix for `source` and the full file name
+                 for its current version, without samplerate and extension
+        """
+        stat = os.stat(source)
+        prefix = hashlib.sha1(os.path.abspath(source).encode()).hexdigest()
+        version = hashlib.sha1(
+            f'{stat.st_mtime_ns}:{stat.st_size}:{tag}'.encode()
+        ).hexdigest()[:16]
+        return prefix, f'{prefix}-{version}'
+
+    def load(self, sound: Any, decode: Callable, tag: str = '',
+             dtype: str = 'float32'):
+        """
+        Load a sound from the store, decode and store it first if necessary
+
+        :param sound: The sound file
+        :param decode: Called with `sound` to decode it, must return a tuple
+                       of the sample data and the samplerate
+        :param tag: Describes the output of `decode` (samplerate...).
+                    Stored data is only reused if the tag matches.
+        :param dtype: The dtype of the returned sample data
+        :return: a tuple of the sample data and the samplerate
+        """
+        source = str(sound)
+        prefix, name = self._names(source, f'int16:{tag}')
+        found = glob.glob(os.path.join(self.path, name + '_*.npy'))
+        if found:
+            fs = int(found[0][:-len('.npy')].rsplit('_', 1)[1])
+            self.hits += 1
+            return _from_pcm(np.load(found[0]), dtype), fs
+
+        self.misses += 1
+        data, fs = decode(sound)
+        # Remove outdated versions of the same source, but not the current
+        # one another thread may have stored meanwhile
+        for old in glob.glob(os.path.join(self.path, prefix + '-*.npy')):
+            if os.path.basename(old).startswith(name + '_'):
+                continue
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        target = os.path.join(self.path, f'{name}_{fs}.npy')
+        # Unique name, so concurrent loads never write the same file
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, _to_pcm(data))
+            os.replace(tmp, target)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        logger.debug(f'stored decoded {source} as {target}')
+        return data, fs
+
+
+class SoundCache:
+    """
+    Keeps decoded sounds in memory, keyed by the path of their file.
+
+    Sounds are decoded on the first `get` or by an explicit `load`. The cache
+    counts hits and misses and keeps statistics on the time spent decoding.
+
+    If `max_bytes` is set, the least recently used sounds are evicted when
+    the cache grows beyond it. Sound effects (`SfxFile`) and sounds added
+    with `pin` are never evicted.
+
+    If a `PCMStore` is given, prerecorded sounds are loaded through it
+    instead of being decoded on every start.
+
+    If `samplerate` is set, sounds are resampled to it when they are loaded.
+    """
+    def __init__(self, dtype: str = 'float32', max_bytes: int = None,
+                 store: PCMStore = None, samplerate: int = None):
+        self.dtype = dtype
+        self.samplerate = samplerate
+        self.max_bytes = max_bytes
+        self.store = store
+        self._sounds = OrderedDict()
+        self._pinned = set()
+        self._lock = threading.Lock()
+        self.resident_bytes = 0
+        self.pinned_bytes = 0
+        self.evictions = 0
+        self.rejections = 0
+        self.hits = 0
+        self.misses = 0
+        self.decodes = 0
+        self.decode_time = 0.
+        self.max_decode_time = 0.
+
+    def __contains__(self, sound: Any):
+        return self.contains(sound)
+
+    def __len__(self):
+        return len(self._sounds)
+
+    def contains(self, sound: Any):
+        """
+        :param sound: The sound file
+        :return: `True` if the sound is in the cache
+        """
+        with self._lock:
+            return str(sound) in self._sounds
+
+    def peek(self, sound: Any):
+        """
+        Look up a sound without loading it or counting a request
+
+        :param sound: The sound file
+        :return: a tuple of the sample data and the samplerate, or `None`
+        """
+        with self._lock:
+            return self._sounds.get(str(sound), None)
+
+    def get(self, sound: Any):
+        """
+        Get a sound from the cache, decode it from disk if necessary
+
+        :param sound: The sound file
+        :return: a tuple of the sample data and the samplerate
+        """
+        with self._lock:
+            entry = self._sounds.get(str(sound), None)
+            if entry is not None:
+                self._sounds.move_to_end(str(sound))
+                self.hits += 1
+                return entry
+            self.misses += 1
+        logger.debug(f'soundcache miss: {sound}')
+        return self.load(sound)
+
+    def load(self, sound: Any, evict: bool = True):
+        """
+        Decode a sound from disk and put it into the cache, replacing any
+        cached version
+
+        :param sound: The sound file
+        :param evict: `False` to only use free space of the cache instead of
+                      evicting other sounds
+        :return: a tuple of the sample data and the samplerate
+        """
+        start = monotonic()
+        if self.store is not None and \
+                getattr(sound, 'filetype', None) is not FileType.REC:
+            try:
+                data, fs = self.store.load(
+                    sound, self._decode, tag=f'{self.samplerate}',
+                    dtype=self.dtype)
+            except OSError:
+                logger.exception(f'pcm store failed for {sound}')
+                data, fs = self._decode(sound)
+        else:
+            data, fs = self._decode(sound)
+        elapsed = monotonic() - start
+        with self._lock:
+            self.decodes += 1
+            self.decode_time += elapsed
+            self.max_decode_time = max(self.max_decode_time, elapsed)
+        logger.debug(f'decoded {sound} in {elapsed * 1000:.1f}ms')
+        return self.put(sound, data, fs, evict=evict)
+
+    def _decode(self, sound: Any):
+        data, fs = sf.read(str(sound), dtype=self.dtype)
+        if self.samplerate is not None and fs != self.samplerate:
+            data, fs = resample(data, fs, self.samplerate), self.samplerate
+        return data, fs
+
+    def put(self, sound: Any, data: Any, fs: int, evict: bool = True):
+        """
+        Put sample data into the cache. If the data does not fit into the
+        byte budget it is returned without being cached. Data is resampled
+        to the cache's samplerate if necessary.
+
+        :param sound: The sound file the data belongs to
+        :param data: The sample data
+        :param fs: The samplerate
+        :param evict: `False` to only use free space of the cache instead of
+                      evicting other sounds
+        :return: a tuple of the sample data and the samplerate
+        """
+        if self.samplerate is not None and fs != self.samplerate:
+            data, fs = resample(data, fs, self.samplerate), self.samplerate
+        entry = (data, fs)
+        key = str(sound)
+        pinned = getattr(sound, 'filetype', None) is FileType.SFX
+        with self._lock:
+            self._remove(key)
+            if pinned:
+                self._pinned.add(key)
+            elif not self._make_room(data.nbytes, evict):
+                self.rejections += 1
+                logger.debug(f'soundcache full, not caching {sound}')
+                return entry
+            self._sounds[key] = entry
+            self.resident_bytes += data.nbytes
+            if pinned:
+                self.pinned_bytes += data.nbytes
+        return entry
+
+    def pin(self, sound: Any):
+        """
+        Protect a cached sound from eviction
+
+        :param sound: The sound file
+        """
+        key = str(sound)
+        with self._lock:
+            if key in self._sounds and key not in self._pinned:
+                self._pinned.add(key)
+                self.pinned_bytes += self._sounds[key][0].nbytes
+
+    def evict(self, sound: Any):
+        """
+        Remove a sound from the cache, even if it is pinned
+
+        :param sound: The sound file
+        """
+        with self._lock:
+            self._remove(str(sound))
+
+    def _remove(self, key: str):
+        entry = self._sounds.pop(key, None)
+        if entry is not None:
+            self.resident_bytes -= entry[0].nbytes
+            if key in self._pinned:
+                self.pinned_bytes -= entry[0].nbytes
+        self._pinned.discard(key)
+
+    def _make_room(self, nbytes: int, evict: bool):
+        """
+        Evict least recently used sounds until `nbytes` fit into the budget.
+        Must be called with the lock held.
+
+        :return: `True` if there is enough room
+        """
+        if self.max_bytes is None:
+            return True
+        if nbytes > self.max_bytes - self.pinned_bytes:
+            return False
+        if not evict:
+            return self.resident_bytes + nbytes <= self.max_bytes
+        for key in list(self._sounds.keys()):
+            if self.resident_bytes + nbytes <= self.max_bytes:
+                break
+            if key in self._pinned:
+                continue
+            self._remove(key)
+            self.evictions += 1
+            logger.debug(f'soundcache evicted {key}')
+        return self.resident_bytes + nbytes <= self.max_bytes
+
+    @property
+    def hit_ratio(self):
+        """
+        :return: hits / (hits + misses), or 0 if nothing was requested yet
+        """
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.
+
+    def stats(self):
+        """
+        :return: a dict with the hit, miss and decode counters
+        """
+        with self._lock:
+            return {
+                'entries': len(self._sounds),
+                'resident_bytes': self.resident_bytes,
+                'pinned_bytes': self.pinned_bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'rejections': self.rejections,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hit_ratio,
+                'store_hits': self.store.hits if self.store else 0,
+                'store_misses': self.store.misses if self.store else 0,
+                'decodes': self.decodes,
+                'decode_time': self.decode_time,
+                'max_decode_time': self.max_decode_time,
+                'mean_decode_time': (self.decode_time / self.decodes
+                                     if self.decodes else 0.)
+            }
+
+
+class Preloader:
+    """
+    Decodes a list of sounds into a `SoundCache` on a thread pool, so that
+    playback never has to wait for the disk.
+
+    Sounds which are already cached are skipped. The preloader only fills
+    free space of the cache and never evicts sounds. Progress and the number
+    of decoded bytes can be read while the preloader is running.
+    """
+    def __init__(self, cache: SoundCache, sounds: List, workers: int = 4):
+        self.cache = cache
+        self.sounds = [s for s in sounds if not cache.contains(s)]
+        self.workers = workers
+        self.done = 0
+        self.failed = 0
+        self.nbytes = 0
+        self.elapsed = 0.
+        self._lock = threading.Lock()
+        self._futures = []
+        self._start = None
+
+    @property
+    def total(self):
+        return len(self.sounds)
+
+    @property
+    def progress(self):
+        """
+        :return: the fraction of sounds loaded [0.0 .. 1.0]
+        """
+        with self._lock:
+            return (self.done + self.failed) / self.total if self.total \
+                else 1.
+
+    def start(self):
+        """
+        Submit all sounds to the thread pool and return immediately
+        """
+        logger.info(f'preloading {self.total} sounds')
+        self._start = monotonic()
+        executor = ThreadPoolExecutor(max_workers=self.workers,
+                                      thread_name_prefix='preload')
+        self._futures = [executor.submit(self._load, sound)
+                         for sound in self.sounds]
+        executor.shutdown(wait=False)
+        return self
+
+    def wait(self, timeout: float = None):
+        """
+        Wait until all sounds are loaded
+
+        :param timeout: float
+                    Default `None`, maximum time in seconds to wait
+        :return: `True` if all sounds are loaded
+        """
+        _, pending = wait(self._futures, timeout=timeout)
+        return not pending
+
+    def _load(self, sound: Any):
+        try:
+            data, _ = self.cache.load(sound, evict=False)
+            nbytes = data.nbytes
+        except Exception:
+            logger.exception(f'could not preload {sound}')
+            nbytes = None
+        with self._lock:
+            if nbytes is None:
+                self.failed += 1
+            else:
+                self.done += 1
+                self.nbytes += nbytes
+            self.elapsed = monotonic() - self._start
+            done = self.done + self.failed
+        logger.debug(f'preloaded {done}/{self.total} sounds '
+                     f'({self.nbytes / 2**20:.1f} MiB)')
+        if done == self.total:
+            logger.info(f'preloaded {self.done} sounds '
+                        f'({self.nbytes / 2**20:.1f} MiB) in '
+                        f'{self.elapsed:.2f}s, {self.failed} failed')
@@ -1,23 +1,30 @@
 import logging
 import os.path
 import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 
 from typing import Any
 
-from time import sleep
+from time import sleep, monotonic
 
 from enum import Enum, auto
 
 from pizzactrl import fs_names, sb_dummy, sb_de_alt
-from .storyboard import Activity
+from . import storyboard
+from .storyboard import Activity, Parallel
 
 from .hal import play_sound, take_photo, record_video, record_sound, turn_off, \
-                 PizzaHAL, init_camera, init_sounds, wait_for_input, \
-                 light_layer, backlight, advance, rewind
+                 PizzaHAL, init_audio, init_camera, init_sounds, \
+                 preload_sounds, wait_for_input, light_layer, backlight, \
+                 advance, rewind, arm_input, arm_camera, gate_stats, \
+                 seek, UserInput, MoveEnd, REC_ARM_LEAD
 
 logger = logging.getLogger(__name__)
 
 
+PARALLEL_WORKERS = 4    # Maximum number of activities running at once
+
+
 class State(Enum):
     POWER_ON = auto()
     POST = auto()
@@ -50,12 +57,36 @@ def load_sounds():
     return soundcache
 
 
+def story_sounds(*stories):
+    """
+    Collect the prerecorded sounds played by storyboards. Recordings made
+    during the session are left out, sounds used by several storyboards are
+    listed once.
+
+    :returns a list of sound file names
+    """
+    sounds = {}
+    for story in stories:
+        if story is None:
+            continue
+        for s in storyboard.sounds(story):
+            if getattr(s, 'filetype', None) is not fs_names.FileType.REC:
+                sounds.setdefault(str(s), s)
+    return list(sounds.values())
+
+
 class Statemachine:
     def __init__(self,
                  story_de: Any=None,
                  story_en: Any=None,
-                 move: bool = False):
-        self.state = State.POWER_ON
+                 move: bool = False,
+                 hold_time: float = 3.0,
+                 camera: str = 'picamera',
+                 camera_options: dict = None):
+        self._state = State.POWER_ON
+        self._state_changed = threading.Condition()
+        self._state_time = monotonic()
+        self.transition_latency = 0.
         self.hal = PizzaHAL()
         self.story = None
         self.story_de = story_de
@@ -63,7 +94,43 @@ class Statemachine:
         self.alt = False
         self.lang = Language.NOT_SET
         self.move = move
+        self.hold_time = hold_time
+        self.camera = camera
+        self.camera_options = camera_options or {}
         self.test = False
+        self.preloader = None
+        self._hold_timer = None
+        self._chapter_start = 0
+        self._executor = ThreadPoolExecutor(max_workers=PARALLEL_WORKERS,
+                                            thread_name_prefix='parallel')
+
+    @property
+    def state(self):
+        return self._state
+
+    @state.setter
+    def state(self, state: State):
+        """
+        Change the state and wake up the main loop if it is waiting for a
+        transition. Safe to call from callback threads.
+        """
+        with self._state_changed:
+            self._state = state
+            self._state_time = monotonic()
+            self._state_changed.notify_all()
+
+    def _wait_for_transition(self, state: State, timeout: float=None):
+        """
+        Sleep until the state changes away from `state`
+
+        :param state: The state to wait in
+        :param timeout: float
+                    Default `None`, maximum time in seconds to wait
+        :return: `True` if the state changed, `False` on timeout
+        """
+        with self._state_changed:
+            return self._state_changed.wait_for(
+                lambda: self._state is not state, timeout)
 
     def run(self):
         logger.debug(f'Run(state={self.state})')
@@ -76,7 +143,12 @@ class Statemachine:
              }
         while (self.state is not State.ERROR) and \
                 (self.state is not State.SHUTDOWN):
-            choice[self.state]()
+            with self._state_changed:
+                state = self._state
+                self.transition_latency = monotonic() - self._state_time
+            logger.info(f'entering {state} '
+                        f'(latency {self.transition_latency * 1000:.1f}ms)')
+            choice[state]()
 
         if self.state is State.ERROR:
             logger.debug('An error occurred. Trying to notify user...')
@@ -106,8 +178,16 @@ class Statemachine:
         logger.debug(f'power on')
         # self.hal.lid_sensor.when_pressed = self._lid_open
         # self.hal.lid_sensor.when_released = self._lid_closed
+        init_audio(self.hal)
         init_sounds(self.hal, load_sounds())
-        init_camera(self.hal)
+        # Decode the stories in the background while POST and the language
+        # prompt run
+        if self.test:
+            stories = [sb_dummy.STORYBOARD]
+        else:
+            stories = [self.story_de, self.story_en]
+        self.preloader = preload_sounds(self.hal, story_sounds(*stories))
+        init_camera(self.hal, self.camera, **self.camera_options)
         self.state = State.POST
 
     def _post(self):
@@ -128,8 +208,10 @@ class Statemachine:
         # play a sound if everything is alright
         play_sound(self.hal, fs_names.SFX_POST_OK)
 
-        # Callback for start when blue button is held
-        self.hal.btn_forward.when_deactivated = self._start
+        # Callback for start when blue button is held. The buttons are
+        # normally closed, holding one makes it inactive.
+        self.hal.btn_forward.when_deactivated = self._hold_started
+        self.hal.btn_forward.when_activated = self._hold_cancelled
 
         self.state = State.IDLE_START
 
@@ -137,22 +219,39 @@ class Statemachine:
         """
         Device is armed. Wait for user to hold blue button to start
         """
-        pass
+        self._wait_for_transition(State.IDLE_START)
 
-    def _start(self):
+    def _hold_started(self):
         """
-        Start playback when blue button is held for 3s
+        Blue button held, start after `hold_time` seconds unless it is
+        released before
         """
-        t = 0.
-        while (self.hal.btn_forward.inactive_time < 3.0) and \
-                not self.hal.btn_forward.is_active:
-            t = self.hal.btn_forward.inactive_time
+        self._hold_cancelled()
+        self._hold_timer = threading.Timer(self.hold_time, self._start)
+        self._hold_timer.daemon = True
+        self._hold_timer.start()
 
-        if t > 3.0:
-            self.hal.btn_forward.when_deactivated = None
-            if not self.hal.btn_back.is_active:
-                self.alt = True
-            self.state = State.PLAY
+    def _hold_cancelled(self):
+        timer = self._hold_timer
+        if timer is not None:
+            timer.cancel()
+            self._hold_timer = None
+
+    def _start(self):
+        """
+        Start playback when blue button is held for `hold_time` seconds.
+        If the back button is held at the same time, the alternate story is
+        played.
+        """
+        if self.hal.btn_forward.is_active:
+            # Released just as the timer expired
+            return
+        self.hal.btn_forward.when_deactivated = None
+        self.hal.btn_forward.when_activated = None
+        self._hold_timer = None
+        self.alt = not self.hal.btn_back.is_active
+        logger.info(f'start (alt={self.alt})')
+        self.state = State.PLAY
 
     def _play(self):
         """
@@ -168,6 +267,8 @@ class Statemachine:
             sleep(0.5)
         else:
             self.story = sb_de_alt.STORYBOARD
+            self.preloader = preload_sounds(self.hal,
+                                            story_sounds(self.story))
 
         try:
             if self.story is None:
@@ -180,40 +281,115 @@ class Statemachine:
 
         for chapter in iter(self.story):
             logger.debug(f'playing chapter {chapter}')
+            self._chapter_start = self.hal.ud_sensor.position
+            for step in chapter.activities:
+                for act in step.members:
+                    if act.activity is Activity.RECORD_VIDEO:
+                        # Buffer video during the steps before the recording
+                        arm_camera(self.hal, **act.values)
             while chapter.hasnext():
-                act = next(chapter)
-                logger.debug(f'next activity {act.activity}')
-                if act.activity is Activity.WAIT_FOR_INPUT:
-                    wait_for_input(hal=self.hal,
-                                   go_callback=chapter.mobilize,
-                                   back_callback=chapter.rewind)
-                elif act.activity is Activity.ADVANCE_UP:
-                    if chapter.move and self.move:
-                        logger.debug(
-                            f'advance{advance}({self.hal.motor_ud}, '
-                            f'{self.hal.ud_sensor})')
-                        advance(motor=self.hal.motor_ud,
-                                sensor=self.hal.ud_sensor)
-                    elif not self.move:
-                        play_sound(self.hal, fs_names.StoryFile('stop'))
+                step = next(chapter)
+                self._arm_recording(chapter, step)
+                if isinstance(step, Parallel):
+                    logger.debug(f'next activities '
+                                 f'{[act.activity for act in step.members]}')
+                    futures = [self._executor.submit(self._do, chapter, act)
+                               for act in step.members]
+                    # Let all members finish before an error ends the step
+                    wait(futures)
+                    for future in futures:
+                        future.result()
                 else:
-                    try:
-                        {
-                            Activity.PLAY_SOUND: play_sound,
-                            Activity.RECORD_SOUND: record_sound,
-                            Activity.RECORD_VIDEO: record_video,
-                            Activity.TAKE_PHOTO: take_photo,
-                            Activity.LIGHT_LAYER: light_layer,
-                            Activity.LIGHT_BACK: backlight,
-                            # Activity.ADVANCE_UP: noop
-
-                        }[act.activity](self.hal, **act.values)
-                    except KeyError:
-                        logger.exception('Caught KeyError, ignoring...')
-                        pass
+                    logger.debug(f'next activity {step.activity}')
+                    self._do(chapter, step)
 
         self.state = State.IDLE_END
 
+    def _estimate(self, step: Any):
+        """
+        :return: the expected duration of a step in seconds, or `None` if it
+                 is not known
+        """
+        durations = []
+        for act in step.members:
+            if act.activity is Activity.PLAY_SOUND:
+                entry = self.hal.soundcache.peek(act.values['sound'])
+                if entry is None:
+                    return None
+                durations.append(len(entry[0]) / entry[1])
+            elif act.activity in (Activity.RECORD_SOUND,
+                                  Activity.RECORD_VIDEO):
+                durations.append(act.values['duration'])
+            elif act.activity in (Activity.WAIT_FOR_INPUT,
+                                  Activity.ADVANCE_UP):
+                return None
+        return max(durations, default=0.)
+
+    def _arm_recording(self, chapter: Any, step: Any):
+        """
+        Open the microphone if a recording starts within `REC_ARM_LEAD`
+        seconds after the current step began, and always during the step
+        right before a recording
+        """
+        ahead = self._estimate(step)
+        for i, upcoming in enumerate(chapter.activities[chapter.pos:]):
+            if i > 0 and (ahead is None or ahead > REC_ARM_LEAD):
+                return
+            for act in upcoming.members:
+                if act.activity is Activity.RECORD_SOUND:
+                    arm_input(self.hal, **act.values)
+                    return
+            duration = self._estimate(upcoming)
+            ahead = None if ahead is None or duration is None \
+                else ahead + duration
+
+    def _do(self, chapter: Any, act: Any):
+        """
+        Execute a single activity of a chapter
+        """
+        if act.activity is Activity.WAIT_FOR_INPUT:
+            user_input, _ = wait_for_input(hal=self.hal,
+                                           go_callback=chapter.mobilize,
+                                           back_callback=chapter.rewind,
+                                           timeout=act.values['timeout'],
+                                           timeout_callback=chapter.mobilize)
+            if user_input is UserInput.BACK and self.move and \
+                    self.hal.frames is not None and \
+                    self.hal.ud_sensor.homed:
+                # Replay the chapter from its first frame
+                move_end, _ = seek(self.hal.motor_ud, self.hal.ud_sensor,
+                                   self.hal.frames,
+                                   self.hal.frames.nearest(
+                                       self._chapter_start))
+                if move_end is MoveEnd.SENSOR:
+                    # The scroll is back at the start, so the replay has to
+                    # advance it again
+                    chapter.mobilize()
+        elif act.activity is Activity.ADVANCE_UP:
+            if chapter.move and self.move:
+                logger.debug(
+                    f'advance{advance}({self.hal.motor_ud}, '
+                    f'{self.hal.ud_sensor})')
+                advance(motor=self.hal.motor_ud,
+                        sensor=self.hal.ud_sensor, **act.values)
+            elif not self.move:
+                play_sound(self.hal, fs_names.StoryFile('stop'))
+        else:
+            try:
+                {
+                    Activity.PLAY_SOUND: play_sound,
+                    Activity.RECORD_SOUND: record_sound,
+                    Activity.RECORD_VIDEO: record_video,
+                    Activity.TAKE_PHOTO: take_photo,
+                    Activity.LIGHT_LAYER: light_layer,
+                    Activity.LIGHT_BACK: backlight,
+                    # Activity.ADVANCE_UP: noop
+
+                }[act.activity](self.hal, **act.values)
+            except KeyError:
+                logger.exception('Caught KeyError, ignoring...')
+                pass
+
     def _idle_end(self):
         """
         Initialize shutdown
@@ -229,6 +405,22 @@ class Statemachine:
         """
         logger.debug('shutdown')
 
+        self._hold_cancelled()
         turn_off(self.hal)
+        logger.info(f'audio: {self.hal.audio.stats()}')
+        logger.info(f'gates: {gate_stats(self.hal)}')
+        logger.info(f'lights: {self.hal.lights.stats()}')
+        self.hal.lights.close()
+        logger.info(f'recorded {self.hal.recorded_bytes / 2**20:.1f} MiB')
+        if self.hal.camera is not None:
+            logger.info(f'camera: {self.hal.camera.stats()}')
+        self.hal.audio.stop(drain=True)
+        logger.info(f'flushing {self.hal.artifacts.depth} artifacts')
+        self.hal.artifacts.flush()
+        logger.info(f'artifacts: {self.hal.artifacts.stats()}')
+        logger.info(f'waiting for {self.hal.postproc.pending} '
+                    f'post-processing jobs')
+        self.hal.postproc.shutdown(wait=True)
+        self._executor.shutdown(wait=False)
 
         del self.hal
@@ -2,14 +2,31 @@ from enum import Enum, auto
 
 
 class Activity(Enum):
-    WAIT_FOR_INPUT = {'steps': 0}
+    WAIT_FOR_INPUT = {'steps': 0, 'timeout': None}
     PLAY_SOUND = {'sound': None}
-    RECORD_SOUND = {'duration': 0.0, 'filename': '', 'cache': False}
-    RECORD_VIDEO = {'duration': 0.0, 'filename': ''}
-    TAKE_PHOTO = {'filename': ''}
-    ADVANCE_UP = {'speed': 0.3, 'direction': True}
-    LIGHT_LAYER = {'intensity': 1.0, 'fade': 0.0, 'layer': True}
-    LIGHT_BACK = {'intensity': 1.0, 'fade': 0.0}
+    RECORD_SOUND = {'duration': 0.0, 'filename': '', 'cache': False,
+                    'format': None, 'subtype': None, 'channels': None,
+                    'samplerate': None, 'stop_on_silence': False,
+                    'min_duration': None, 'trailing_silence': None}
+    RECORD_VIDEO = {'duration': 0.0, 'filename': '', 'preroll': 0.0}
+    TAKE_PHOTO = {'filename': '', 'video_port': False}
+    ADVANCE_UP = {'speed': 0.3, 'direction': True, 'counts': None}
+    LIGHT_LAYER = {'intensity': 1.0, 'fade': 0.0, 'layer': True,
+                   'shape': 'gamma'}
+    LIGHT_BACK = {'intensity': 1.0, 'fade': 0.0, 'shape': 'gamma'}
+
+
+# The device each activity occupies while it runs
+DEVICES = {
+    Activity.WAIT_FOR_INPUT: 'buttons',
+    Activity.PLAY_SOUND: 'audio_out',
+    Activity.RECORD_SOUND: 'audio_in',
+    Activity.RECORD_VIDEO: 'camera',
+    Activity.TAKE_PHOTO: 'camera',
+    Activity.ADVANCE_UP: 'motor_ud',
+    Activity.LIGHT_LAYER: 'led_layer',
+    Activity.LIGHT_BACK: 'led_backlight'
+}
 
 
 class Do:
@@ -19,6 +36,39 @@ class Do:
         for key, value in self.activity.value.items():
             self.values[key] = kwargs.get(key, value)
 
+    @property
+    def members(self):
+        return (self, )
+
+
+class Parallel:
+    """
+    A group of activities which run at the same time. The next step starts
+    when all of them are done.
+
+    Activities in a group must not use the same device, and a group must not
+    wait for input.
+    """
+    activity = None
+
+    def __init__(self, *activities: Do):
+        devices = {}
+        for act in activities:
+            if not isinstance(act, Do):
+                raise ValueError(f'Parallel can only contain Do, got {act}')
+            if act.activity is Activity.WAIT_FOR_INPUT:
+                raise ValueError('Parallel can not contain WAIT_FOR_INPUT')
+            device = DEVICES[act.activity]
+            if device in devices:
+                raise ValueError(f'{act.activity} and {devices[device]} '
+                                 f'both use {device}')
+            devices[device] = act.activity
+        self.activities = activities
+
+    @property
+    def members(self):
+        return self.activities
+
 
 class Chapter:
     """
@@ -39,7 +89,7 @@ class Chapter:
         if self.pos >= len(self.activities):
             raise StopIteration
         act = self.activities[self.pos]
-        if act.activity is Activity.ADVANCE_UP:
+        if any(m.activity is Activity.ADVANCE_UP for m in act.members):
             self.move_ud += 1
         self.pos += 1
         return act
@@ -47,6 +97,14 @@ class Chapter:
     def hasnext(self):
         return self.pos < len(self.activities)
 
+    def peek(self):
+        """
+        :return: the next activity without advancing, or `None`
+        """
+        if self.hasnext():
+            return self.activities[self.pos]
+        return None
+
     def rewind(self, **kwargs):
         self.move = False
         self.move_ud = 0
@@ -55,3 +113,21 @@ class Chapter:
     def mobilize(self, **kwargs):
         self.move = True
 
+
+def sounds(story):
+    """
+    Collect the sounds played by a storyboard in order of appearance, without
+    duplicates
+
+    :param story: A list of `Chapter`s
+    :return: a list of sound files
+    """
+    found = {}
+    for chapter in story:
+        for step in chapter.activities:
+            for act in step.members:
+                if act.activity is Activity.PLAY_SOUND and \
+                        act.values['sound'] is not None:
+                    found.setdefault(str(act.values['sound']),
+                                     act.values['sound'])
+    return list(found.values())
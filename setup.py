@@ -1,11 +1,9 @@
 import re
 import ast
-import scipy
 import wave
 
 import click
 import gpiozero
-import picamera
 import pyaudio as pyaudio
 import pydub
 import sounddevice as sounddevice
@@ -38,14 +36,14 @@ with open('pizzactrl/__init__.py', 'rb') as f:
             'picamera',
             'click',
             'sounddevice',
-            'soundfile',
-            'scipy'
+            'soundfile'
         ],
 
         entry_points='''
             [console_scripts]
             pizzabox=pizzactrl.main:main
             pizza-rewind=pizzactrl.main:rewind
+            pizza-calibrate=pizzactrl.main:calibrate
         ''',
 
         include_package_data=True